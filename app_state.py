@@ -5,8 +5,10 @@ Migrated from Claude Agent SDK to LiteLLM with Gemini.
 
 from __future__ import annotations
 
+import asyncio
 import time
 import uuid
+from contextvars import ContextVar
 from pathlib import Path
 from typing import TYPE_CHECKING
 
@@ -36,6 +38,14 @@ agentfs: AgentFS | None = None
 current_session_id: str | None = None
 current_model: str = "gemini/gemini-2.0-flash"
 
+# Request-scoped AgentFS override (falls back to the module singleton).
+# Lets tests or nested tasks pin a specific instance without touching globals.
+_agentfs_ctx: ContextVar["AgentFS | None"] = ContextVar("agentfs", default=None)
+
+# Serializes lazy AgentFS.open calls: a burst of concurrent first requests
+# must not open duplicate connections to the same session
+_agentfs_open_lock = asyncio.Lock()
+
 
 # =============================================================================
 # LLM PROVIDER MANAGEMENT
@@ -154,11 +164,35 @@ async def get_agentfs() -> "AgentFS":
     global agentfs
 
     if agentfs is None:
-        _, agentfs, _ = await get_session()
+        async with _agentfs_open_lock:
+            if agentfs is None:
+                _, agentfs, _ = await get_session()
 
     return agentfs
 
 
+async def get_async_agentfs() -> "AgentFS":
+    """Get the shared AgentFS connection for the current context.
+
+    Prefers an instance bound via bind_agentfs() (request/test scoped),
+    otherwise returns the process-wide singleton. Handlers should use this
+    instead of opening their own connections so every KV call reuses the
+    same underlying session.
+    """
+    fs = _agentfs_ctx.get()
+    if fs is not None:
+        return fs
+    return await get_agentfs()
+
+
+def bind_agentfs(fs: "AgentFS") -> object:
+    """Bind an AgentFS instance to the current context.
+
+    Returns the ContextVar token, so callers can reset it if needed.
+    """
+    return _agentfs_ctx.set(fs)
+
+
 # =============================================================================
 # GROUP STATE AGENTFS (sessão dedicada para dados de grupos)
 # =============================================================================
@@ -177,8 +211,10 @@ async def get_group_agentfs() -> "AgentFS":
     if _group_agentfs is None:
         from agentfs_sdk import AgentFS, AgentFSOptions
 
-        _group_agentfs = await AgentFS.open(AgentFSOptions(id=GROUP_SESSION_ID))
-        print(f"[INFO] Group AgentFS initialized with session: {GROUP_SESSION_ID}")
+        async with _agentfs_open_lock:
+            if _group_agentfs is None:
+                _group_agentfs = await AgentFS.open(AgentFSOptions(id=GROUP_SESSION_ID))
+                print(f"[INFO] Group AgentFS initialized with session: {GROUP_SESSION_ID}")
 
     return _group_agentfs
 
@@ -201,8 +237,10 @@ async def get_quiz_agentfs() -> "AgentFS":
     if _quiz_agentfs is None:
         from agentfs_sdk import AgentFS, AgentFSOptions
 
-        _quiz_agentfs = await AgentFS.open(AgentFSOptions(id=QUIZ_SESSION_ID))
-        print(f"[INFO] Quiz AgentFS initialized with session: {QUIZ_SESSION_ID}")
+        async with _agentfs_open_lock:
+            if _quiz_agentfs is None:
+                _quiz_agentfs = await AgentFS.open(AgentFSOptions(id=QUIZ_SESSION_ID))
+                print(f"[INFO] Quiz AgentFS initialized with session: {QUIZ_SESSION_ID}")
 
     return _quiz_agentfs
 
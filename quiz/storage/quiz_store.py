@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, Iterable
 
 if TYPE_CHECKING:
     from agentfs_sdk import AgentFS
@@ -211,6 +211,27 @@ class QuizStore:
 
         return state.questions.get(index)
 
+    async def get_questions(
+        self, quiz_id: str, indexes: Iterable[int]
+    ) -> list[QuizQuestion | None]:
+        """Busca várias perguntas com uma única leitura de estado.
+
+        Todas as perguntas vivem no mesmo blob de estado, então buscar N
+        delas custa o mesmo round-trip de buscar uma.
+
+        Args:
+            quiz_id: ID do quiz
+            indexes: Índices das perguntas (1-10)
+
+        Returns:
+            Lista na ordem pedida; None nas posições ainda não prontas
+        """
+        state = await self.load_state(quiz_id)
+        if state is None:
+            return [None for _ in indexes]
+
+        return [state.questions.get(index) for index in indexes]
+
     async def is_question_ready(self, quiz_id: str, index: int) -> bool:
         """Verifica se uma pergunta específica está pronta.
 
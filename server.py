@@ -21,6 +21,14 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
+# Serialização de respostas via orjson quando instalado (Rust/C, 2-5x
+# mais rápido que o json stdlib nos payloads grandes de webhook/admin)
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as _DefaultResponseClass
+except ImportError:
+    _DefaultResponseClass = JSONResponse
+
 import app_state
 from a2a_rag_sdk.core.auth import is_auth_enabled
 from a2a_rag_sdk.core.exceptions import RAGException
@@ -56,6 +64,26 @@ from whatsapp.welcome_router import router as whatsapp_welcome_router
 async def lifespan(app: FastAPI):
     """Manage app lifecycle."""
     logger.info("Starting Agent Quiz...")
+    # Abrir a conexão AgentFS compartilhada já no startup: o primeiro
+    # webhook não paga o custo de AgentFS.open
+    try:
+        await app_state.get_agentfs()
+    except Exception as e:
+        logger.warning("Error pre-opening AgentFS", error=str(e))
+    # Inicializar quiz logger eagerly - call sites ficam sem await
+    try:
+        from whatsapp.quiz_logger import init_quiz_logger
+
+        await init_quiz_logger()
+    except Exception as e:
+        logger.warning("Error initializing quiz logger", error=str(e))
+    # Micro-batcher da Evolution: rajadas de DMs saem num flush só
+    try:
+        from whatsapp.evolution_client import get_evolution_client
+
+        await get_evolution_client().batcher.start()
+    except Exception as e:
+        logger.warning("Error starting Evolution batcher", error=str(e))
     yield
     # Cleanup watcher before app_state
     try:
@@ -66,6 +94,22 @@ async def lifespan(app: FastAPI):
             watcher.stop()
     except Exception as e:
         logger.warning("Error stopping watcher", error=str(e))
+    # Flush pending quiz logs before closing storage
+    try:
+        from whatsapp.quiz_logger import shutdown_quiz_logger
+
+        await shutdown_quiz_logger()
+    except Exception as e:
+        logger.warning("Error flushing quiz logger", error=str(e))
+    # Drenar e fechar o batcher da Evolution
+    try:
+        import whatsapp.evolution_client as evolution_client
+
+        if evolution_client._evolution_client is not None:
+            await evolution_client._evolution_client.batcher.stop()
+            await evolution_client._evolution_client.aclose()
+    except Exception as e:
+        logger.warning("Error stopping Evolution batcher", error=str(e))
     await app_state.cleanup()
 
 
@@ -104,6 +148,7 @@ data: [DONE]
 """,
     version="3.0.0",
     lifespan=lifespan,
+    default_response_class=_DefaultResponseClass,
     openapi_tags=[
         {"name": "Chat", "description": "Endpoints de conversação com Claude"},
         {"name": "RAG", "description": "Busca semântica e ingestão de documentos"},
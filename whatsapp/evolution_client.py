@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 from typing import Any
@@ -10,6 +11,104 @@ import httpx
 
 logger = logging.getLogger(__name__)
 
+# Micro-batching dos sends: mensagens enfileiradas dentro desta janela
+# saem juntas num único flush, compartilhando conexões keep-alive
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT_SECONDS = 0.05
+
+
+class EvolutionBatcher:
+    """Micro-batcher de send_text: agrupa rajadas num único flush.
+
+    Um join storm gera dezenas de DMs quase simultâneas; cada uma com um
+    AsyncClient próprio paga o handshake TCP/TLS completo. O batcher
+    coleta mensagens por até ~50ms (ou 32 itens) e despacha o lote por
+    um client compartilhado com pool de conexões, resolvendo o future de
+    cada chamada com seu resultado individual — os call sites continuam
+    com o mesmo `await evolution.send_text(...)`.
+    """
+
+    def __init__(self, api: EvolutionAPIClient):
+        self._api = api
+        self._queue: asyncio.Queue[tuple[str, str, int, asyncio.Future]] = (
+            asyncio.Queue()
+        )
+        self._http: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        """Se o worker está ativo (iniciado via lifespan)."""
+        return self._task is not None and self._http is not None
+
+    async def start(self) -> None:
+        """Inicia o worker sobre o client HTTP compartilhado do cliente."""
+        if self._task is not None:
+            return
+        self._http = self._api._get_http()
+        self._task = asyncio.create_task(self._worker())
+        logger.info("EvolutionBatcher iniciado")
+
+    async def stop(self) -> None:
+        """Para o worker, despachando o que restar na fila."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        leftovers = []
+        while not self._queue.empty():
+            leftovers.append(self._queue.get_nowait())
+        if leftovers:
+            await self._flush(leftovers)
+        # O client compartilhado pertence ao EvolutionAPIClient (aclose)
+        self._http = None
+
+    async def submit(self, number: str, text: str, delay: int = 1000) -> dict[str, Any]:
+        """Enfileira uma mensagem e aguarda o resultado do seu envio."""
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        await self._queue.put((number, text, delay, future))
+        return await future
+
+    async def _worker(self) -> None:
+        """Drena a fila em lotes: até BATCH_MAX_SIZE ou o fim da janela."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + BATCH_MAX_WAIT_SECONDS
+            while len(batch) < BATCH_MAX_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[str, str, int, asyncio.Future]]) -> None:
+        """Envia um lote pelo client compartilhado, item a item concorrente."""
+        url = f"{self._api.base_url}/message/sendText/{self._api.instance_name}"
+
+        async def _post(item: tuple[str, str, int, asyncio.Future]) -> None:
+            number, text, delay, future = item
+            try:
+                response = await self._http.post(
+                    url,
+                    json={"number": number, "text": text, "delay": delay},
+                    headers=self._api.headers,
+                )
+                response.raise_for_status()
+                future.set_result(response.json())
+            except Exception as e:
+                future.set_exception(e)
+
+        await asyncio.gather(*(_post(item) for item in batch))
+        if len(batch) > 1:
+            logger.info(f"Lote de {len(batch)} mensagens despachado")
+
 
 class EvolutionAPIClient:
     """Cliente HTTP para Evolution API.
@@ -41,11 +140,35 @@ class EvolutionAPIClient:
             "Content-Type": "application/json",
             "apikey": api_key,
         }
+        # Micro-batcher (ativado no lifespan do app)
+        self.batcher = EvolutionBatcher(self)
+        # Client HTTP compartilhado pela vida do app: as conexões ficam
+        # keep-alive em vez de pagar handshake TCP/TLS por mensagem
+        self._http: httpx.AsyncClient | None = None
 
         logger.info(
             f"EvolutionAPIClient inicializado: {base_url} (instance: {instance_name})"
         )
 
+    def _get_http(self) -> httpx.AsyncClient:
+        """Retorna o client HTTP compartilhado, criando sob demanda."""
+        if self._http is None or self._http.is_closed:
+            limits = httpx.Limits(max_keepalive_connections=50)
+            try:
+                self._http = httpx.AsyncClient(
+                    timeout=self.timeout, limits=limits, http2=True
+                )
+            except ImportError:
+                # http2 exige o pacote h2; keep-alive já evita os handshakes
+                self._http = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        return self._http
+
+    async def aclose(self) -> None:
+        """Fecha o client compartilhado (teardown do lifespan)."""
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+
     async def send_text(
         self,
         number: str,
@@ -62,6 +185,10 @@ class EvolutionAPIClient:
         Returns:
             Resposta da API
         """
+        # Com o batcher ativo, rajadas compartilham o flush e o pool
+        if self.batcher.running:
+            return await self.batcher.submit(number, text, delay)
+
         url = f"{self.base_url}/message/sendText/{self.instance_name}"
         payload = {
             "number": number,
@@ -70,16 +197,80 @@ class EvolutionAPIClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"Mensagem enviada para {number}: {len(text)} chars")
-                return result
+            client = self._get_http()
+            response = await client.post(url, json=payload, headers=self.headers)
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"Mensagem enviada para {number}: {len(text)} chars")
+            return result
         except httpx.HTTPError as e:
             logger.error(f"Erro ao enviar mensagem: {e}")
             raise
 
+    async def send_text_bytes(self, number: str, template: bytes) -> dict[str, Any]:
+        """Envia texto a partir de um template JSON pré-serializado.
+
+        O template deve conter um único %s onde o número entra, para
+        respostas constantes não pagarem json.dumps por chamada.
+
+        Args:
+            number: Número do destinatário
+            template: Corpo JSON pré-serializado com placeholder %s
+
+        Returns:
+            Resposta da API
+        """
+        url = f"{self.base_url}/message/sendText/{self.instance_name}"
+        content = template % number.encode()
+
+        try:
+            client = self._get_http()
+            response = await client.post(url, content=content, headers=self.headers)
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"Mensagem (template) enviada para {number}")
+            return result
+        except httpx.HTTPError as e:
+            logger.error(f"Erro ao enviar mensagem: {e}")
+            raise
+
+    async def send_text_batch(
+        self, messages: list[tuple[str, str]], delay: int = 1000
+    ) -> list[dict[str, Any]]:
+        """Envia várias mensagens de texto concorrentemente.
+
+        Os POSTs saem pelo client compartilhado do processo, dividindo
+        as conexões keep-alive em vez de pagar um handshake por mensagem.
+
+        Args:
+            messages: Pares (number, text)
+            delay: Delay por mensagem (ms)
+
+        Returns:
+            Respostas da API, na ordem dos pares
+        """
+        url = f"{self.base_url}/message/sendText/{self.instance_name}"
+
+        async def _post(client: httpx.AsyncClient, number: str, text: str) -> dict[str, Any]:
+            response = await client.post(
+                url,
+                json={"number": number, "text": text, "delay": delay},
+                headers=self.headers,
+            )
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            client = self._get_http()
+            results = await asyncio.gather(
+                *(_post(client, number, text) for number, text in messages)
+            )
+            logger.info(f"Lote de {len(messages)} mensagens enviado")
+            return list(results)
+        except httpx.HTTPError as e:
+            logger.error(f"Erro ao enviar lote de mensagens: {e}")
+            raise
+
     async def send_buttons(
         self,
         number: str,
@@ -111,12 +302,12 @@ class EvolutionAPIClient:
             payload["footer"] = footer
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"Botões enviados para {number}: {len(buttons)} opções")
-                return result
+            client = self._get_http()
+            response = await client.post(url, json=payload, headers=self.headers)
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"Botões enviados para {number}: {len(buttons)} opções")
+            return result
         except httpx.HTTPError as e:
             logger.error(f"Erro ao enviar botões: {e}")
             raise
@@ -155,12 +346,12 @@ class EvolutionAPIClient:
             payload["footer"] = footer
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"Lista enviada para {number}")
-                return result
+            client = self._get_http()
+            response = await client.post(url, json=payload, headers=self.headers)
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"Lista enviada para {number}")
+            return result
         except httpx.HTTPError as e:
             logger.error(f"Erro ao enviar lista: {e}")
             raise
@@ -174,10 +365,10 @@ class EvolutionAPIClient:
         url = f"{self.base_url}/instance/connectionState/{self.instance_name}"
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
-                return response.json()
+            client = self._get_http()
+            response = await client.get(url, headers=self.headers)
+            response.raise_for_status()
+            return response.json()
         except httpx.HTTPError as e:
             logger.error(f"Erro ao verificar status: {e}")
             raise
@@ -206,12 +397,12 @@ class EvolutionAPIClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                response.raise_for_status()
-                result = response.json()
-                logger.debug(f"Presença '{presence}' enviada para {number}")
-                return result
+            client = self._get_http()
+            response = await client.post(url, json=payload, headers=self.headers)
+            response.raise_for_status()
+            result = response.json()
+            logger.debug(f"Presença '{presence}' enviada para {number}")
+            return result
         except httpx.HTTPError as e:
             logger.warning(f"Erro ao enviar presença (não crítico): {e}")
             return {}
@@ -249,12 +440,12 @@ class EvolutionAPIClient:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                response.raise_for_status()
-                result = response.json()
-                logger.info(f"Webhook configurado: {webhook_url}")
-                return result
+            client = self._get_http()
+            response = await client.post(url, json=payload, headers=self.headers)
+            response.raise_for_status()
+            result = response.json()
+            logger.info(f"Webhook configurado: {webhook_url}")
+            return result
         except httpx.HTTPError as e:
             logger.error(f"Erro ao configurar webhook: {e}")
             raise
@@ -3,9 +3,16 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import os
 
+try:
+    import orjson
+except ImportError:
+    # orjson não instalado - cai no parser stdlib
+    orjson = None
+
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 
 import app_state
@@ -20,13 +27,31 @@ from .group_formatter import GroupMessageFormatter, _format_participant_name
 from .group_manager_kv import GroupStateManagerKV
 from .group_models import GroupCommand, GroupQuizSession, GroupQuizState
 from .quiz_logger import get_quiz_logger, LogCategory, QuizLogger
+from .rag_cache import cached_rag_search
 from .user_manager_kv import UserManagerKV
 from .user_models import UserProfile, WelcomeConfig
+from .welcome_router import SIGNATURE_HEADER, verify_webhook_signature
 from .welcome_router import get_user_manager as welcome_get_user_manager
 from .welcome_router import process_group_join as welcome_process_group_join
 
 logger = logging.getLogger(__name__)
 
+# Decode do corpo do webhook: orjson quando disponível (C)
+_loads = orjson.loads if orjson is not None else json.loads
+
+# Variantes do evento de participantes (comparadas contra event.lower())
+_PARTICIPANT_EVENTS = frozenset(
+    {
+        "groups.participants.update",
+        "group-participants.update",
+        "group_participants_update",
+    }
+)
+
+# Normalização de acentos dos comandos em uma passada (translate em C,
+# no lugar de oito .replace encadeados alocando uma string cada)
+_ACCENT_TABLE = str.maketrans("ÇÁÉÍÓÚÃÕ", "CAEIOUAO")
+
 router = APIRouter(prefix="/whatsapp/group", tags=["WhatsApp Group"])
 
 # =============================================================================
@@ -94,20 +119,29 @@ async def group_webhook(
 
     Mensagens individuais são ignoradas.
     """
+    # Corpo cru lido uma vez: serve para a assinatura e para o decode
+    raw = await request.body()
+    if not verify_webhook_signature(raw, request.headers.get(SIGNATURE_HEADER)):
+        logger.warning("[WEBHOOK] Assinatura de webhook inválida")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
     try:
-        body = await request.json()
-        logger.debug(f"[WEBHOOK] Recebido: {body}")
+        # Decode direto dos bytes crus (orjson quando disponível): payloads
+        # de GROUP_PARTICIPANTS_UPDATE com dezenas de membros são grandes
+        body = _loads(raw)
+        logger.debug("[WEBHOOK] Recebido: %s", body)
 
         event = body.get("event", "")
         data = body.get("data", {})
 
-        logger.debug(f"[WEBHOOK] event={event}, keys={list(body.keys())}")
+        logger.debug("[WEBHOOK] event=%s, keys=%s", event, list(body.keys()))
 
         # =====================================================================
         # EVENTO: Participante entrou/saiu do grupo
         # Delegado ao welcome_router (separação de responsabilidades)
         # =====================================================================
-        if event.lower() in ["groups.participants.update", "group-participants.update", "group_participants_update"]:
+        event_lower = event.lower()
+        if event_lower in _PARTICIPANT_EVENTS:
             # Delegar ao welcome_router para processar DMs de boas-vindas
             user_manager = await welcome_get_user_manager()
             background_tasks.add_task(
@@ -125,14 +159,14 @@ async def group_webhook(
                 evolution=evolution,
             )
 
-            logger.info(f"[WEBHOOK] Delegando evento de participante ao welcome_router + quiz auto-join")
+            logger.info("[WEBHOOK] Delegando evento de participante ao welcome_router + quiz auto-join")
             return {"status": "ok", "message": "delegated to welcome_router"}
 
         # =====================================================================
         # EVENTO: Mensagem recebida
         # =====================================================================
         # Evolution API pode enviar como "messages.upsert" ou "MESSAGES_UPSERT"
-        if event.lower() != "messages.upsert" and event != "MESSAGES_UPSERT":
+        if event_lower != "messages.upsert" and event != "MESSAGES_UPSERT":
             return {"status": "ignored", "reason": f"event {event} not supported"}
 
         message_data = data.get("message", {})
@@ -151,14 +185,14 @@ async def group_webhook(
 
         if not is_group:
             # Mensagem individual - ignorar silenciosamente (não responder)
-            logger.info(f"📱 Mensagem individual ignorada de: {remote_jid}")
+            logger.info("📱 Mensagem individual ignorada de: %s", remote_jid)
             return {"status": "ignored", "reason": "private message ignored"}
 
         # É mensagem de grupo - verificar whitelist
         group_id = remote_jid
         if not await group_manager.is_group_allowed(group_id):
             # Grupo não autorizado - ignorar silenciosamente
-            logger.debug(f"Grupo não autorizado (ignorando): {group_id}")
+            logger.debug("Grupo não autorizado (ignorando): %s", group_id)
             return {"status": "ignored", "reason": "group not whitelisted"}
 
         # Extrair texto da mensagem
@@ -172,7 +206,7 @@ async def group_webhook(
         elif message_type == "extendedTextMessage":
             text = message_data.get("extendedTextMessage", {}).get("text", "")
 
-        logger.debug(f"[WEBHOOK] group={remote_jid}, type={message_type}, text={text[:50] if text else 'EMPTY'}")
+        logger.debug("[WEBHOOK] group=%s, type=%s, text=%s", remote_jid, message_type, text[:50] if text else "EMPTY")
 
         if not text:
             return {"status": "ignored", "reason": "no text in message"}
@@ -204,7 +238,7 @@ async def group_webhook(
         return {"status": "ok", "message": "processing"}
 
     except Exception as e:
-        logger.error(f"Erro no webhook de grupo: {e}", exc_info=True)
+        logger.error("Erro no webhook de grupo: %s", e, exc_info=True)
         return {"status": "error", "message": str(e)}
 
 
@@ -244,22 +278,22 @@ async def process_participant_update(
         if not participants and data.get("participant"):
             participants = [data.get("participant")]
 
-        logger.info(f"👥 Evento de grupo: {action} em {group_id} - {len(participants)} participantes")
+        logger.info("👥 Evento de grupo: %s em %s - %s participantes", action, group_id, len(participants))
 
         # Só processar entradas (add/join)
         if action not in ["add", "join", "invite"]:
-            logger.debug(f"Ação '{action}' ignorada (não é entrada)")
+            logger.debug("Ação '%s' ignorada (não é entrada)", action)
             return
 
         # Verificar se grupo está na whitelist
         if not await group_manager.is_group_allowed(group_id):
-            logger.debug(f"Grupo {group_id} não está na whitelist, ignorando")
+            logger.debug("Grupo %s não está na whitelist, ignorando", group_id)
             return
 
         # Buscar config de welcome do grupo
         welcome_config = await user_manager.get_welcome_config(group_id)
         if not welcome_config.enabled:
-            logger.debug(f"Welcome desabilitado para grupo {group_id}")
+            logger.debug("Welcome desabilitado para grupo %s", group_id)
             return
 
         # Buscar nome do grupo (se disponível)
@@ -288,10 +322,10 @@ async def process_participant_update(
                     evolution=evolution,
                 )
             except Exception as e:
-                logger.error(f"Erro ao enviar welcome para {participant_jid}: {e}")
+                logger.error("Erro ao enviar welcome para %s: %s", participant_jid, e)
 
     except Exception as e:
-        logger.error(f"Erro ao processar participant update: {e}", exc_info=True)
+        logger.error("Erro ao processar participant update: %s", e, exc_info=True)
 
 
 async def _process_auto_join_quiz(
@@ -495,12 +529,12 @@ async def _send_welcome_dm(
             text=welcome_message,
         )
 
-        # Marcar como welcomed
-        await user_manager.mark_user_welcomed(participant_jid, group_id)
+        # Marcar como welcomed (perfil já carregado: sem nova busca)
+        await user_manager.mark_user_welcomed(user, group_id)
 
         # Registrar mensagem no histórico
         await user_manager.add_conversation_message(
-            user_id=participant_jid,
+            user,
             role="assistant",
             content=welcome_message,
         )
@@ -540,17 +574,7 @@ async def process_group_message(
 
         # Normalizar acentos para comandos
         # COMEÇAR -> COMECAR, PRÓXIMA -> PROXIMA, etc.
-        text_normalized = (
-            text_upper
-            .replace("Ç", "C")
-            .replace("Á", "A")
-            .replace("É", "E")
-            .replace("Í", "I")
-            .replace("Ó", "O")
-            .replace("Ú", "U")
-            .replace("Ã", "A")
-            .replace("Õ", "O")
-        )
+        text_normalized = text_upper.translate(_ACCENT_TABLE)
 
         # Buscar sessão do grupo
         session = await group_manager.get_session(group_id)
@@ -737,7 +761,7 @@ async def handle_waiting_start_state(
             engine = QuizEngine(agentfs=agentfs, rag=rag)
 
             # Validar RAG
-            search_results = await rag.search("programa Renda Extra Ton", top_k=3)
+            search_results = await cached_rag_search(rag, "programa Renda Extra Ton", top_k=3)
             if not search_results:
                 await evolution.send_text(
                     group_id,
@@ -854,7 +878,7 @@ async def handle_doubt_request(
 
         # Buscar no RAG
         rag = await app_state.get_rag()
-        search_results = await rag.search(question_text, top_k=3)
+        search_results = await cached_rag_search(rag, question_text, top_k=3)
 
         if not search_results:
             await evolution.send_text(
@@ -985,7 +1009,7 @@ async def handle_hint_request(
 
         # Buscar informações relevantes no RAG
         search_query = f"{topic} {question_text}" if topic else question_text
-        search_results = await rag.search(search_query, top_k=3)
+        search_results = await cached_rag_search(rag, search_query, top_k=3)
 
         # Obter dicas já dadas para não repetir
         current_state = session.get_current_question_state()
@@ -1147,7 +1171,7 @@ async def handle_group_answer(
         await group_manager.save_session(session)
 
         # Logar resposta
-        quiz_logger = await get_quiz_logger()
+        quiz_logger = get_quiz_logger()
         await quiz_logger.answer_received(
             group_id=group_id,
             user_id=user_id,
@@ -1245,7 +1269,7 @@ async def handle_group_answer(
     except Exception as e:
         logger.error(f"Erro ao processar resposta no grupo: {e}", exc_info=True)
         try:
-            quiz_logger = await get_quiz_logger()
+            quiz_logger = get_quiz_logger()
             await quiz_logger.error(
                 message="Erro ao processar resposta",
                 error=str(e),
@@ -1285,7 +1309,7 @@ async def generate_answer_explanation(
 
         # Buscar contexto no RAG
         search_query = f"{topic} {question_text}" if topic else question_text
-        search_results = await rag.search(search_query, top_k=2)
+        search_results = await cached_rag_search(rag, search_query, top_k=2)
 
         if not search_results:
             return None
@@ -1576,7 +1600,7 @@ async def get_quiz_logs(
         limit: Limite de resultados (default 50)
     """
     try:
-        quiz_logger = await get_quiz_logger()
+        quiz_logger = get_quiz_logger()
 
         # Converter categoria se fornecida
         cat = None
@@ -1606,7 +1630,7 @@ async def get_quiz_logs(
 async def get_recent_errors(limit: int = 20):
     """Lista erros recentes (ADMIN)."""
     try:
-        quiz_logger = await get_quiz_logger()
+        quiz_logger = get_quiz_logger()
         errors = await quiz_logger.get_recent_errors(limit=limit)
         return {
             "total": len(errors),
@@ -1621,7 +1645,7 @@ async def get_recent_errors(limit: int = 20):
 async def get_group_logs(group_id: str, limit: int = 50):
     """Lista atividade de um grupo específico (ADMIN)."""
     try:
-        quiz_logger = await get_quiz_logger()
+        quiz_logger = get_quiz_logger()
         logs = await quiz_logger.get_group_activity(group_id=group_id, limit=limit)
         return {
             "total": len(logs),
@@ -1891,11 +1915,11 @@ async def send_manual_welcome(
         # Enviar
         result = await evolution.send_text(phone_clean, welcome_message)
 
-        # Marcar como welcomed
-        await user_manager.mark_user_welcomed(user_id, group_id)
+        # Marcar como welcomed (perfil já carregado: sem nova busca)
+        await user_manager.mark_user_welcomed(user, group_id)
 
         # Registrar no histórico
-        await user_manager.add_conversation_message(user_id, "assistant", welcome_message)
+        await user_manager.add_conversation_message(user, "assistant", welcome_message)
 
         return {
             "status": "ok",
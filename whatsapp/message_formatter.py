@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -200,9 +201,13 @@ Durante o quiz, responda com:
         return f"{filled}{empty} {question_num}/{total}"
 
     @staticmethod
+    @lru_cache(maxsize=32)
     def format_error(message: str = "Ocorreu um erro. Tente novamente.") -> str:
         """Formata mensagem de erro.
 
+        Os call sites usam um punhado de strings constantes, então o
+        lru_cache transforma a formatação em lookup de dict.
+
         Args:
             message: Mensagem de erro
 
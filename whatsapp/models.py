@@ -28,6 +28,10 @@ class UserQuizState(BaseModel):
     answers: list[int] = Field(default_factory=list, description="Respostas do usuário")
     score: int = Field(default=0, description="Pontuação atual")
     chat_session_id: str | None = Field(default=None, description="ID da sessão de chat de dúvidas")
+    questions_cache: dict[str, Any] = Field(
+        default_factory=dict,
+        description="Perguntas já buscadas, por índice (imutáveis após geradas)",
+    )
 
     class Config:
         use_enum_values = True
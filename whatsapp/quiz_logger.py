@@ -2,12 +2,23 @@
 
 from __future__ import annotations
 
+import asyncio
+import itertools
 import logging
-from datetime import datetime
+import os
+import time
+from datetime import datetime, timedelta
 from enum import Enum
-from typing import TYPE_CHECKING, Any
+from typing import TYPE_CHECKING, Any, AsyncIterator
 
-from pydantic import BaseModel, Field
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    TypeAdapter,
+    computed_field,
+    model_validator,
+)
 
 if TYPE_CHECKING:
     from agentfs_sdk import AgentFS
@@ -16,7 +27,37 @@ logger = logging.getLogger(__name__)
 
 # Prefixos de chave no KVStore
 KEY_PREFIX_LOG = "log:"
+KEY_PREFIX_LOG_BATCH = "log:batch:"
 KEY_PREFIX_LOG_INDEX = "log:index:"
+KEY_PREFIX_LOG_GROUP_INDEX = "log:index:group:"
+
+# Quantos dias de índices de grupo varrer quando não há filtro de data
+GROUP_INDEX_LOOKBACK_DAYS = 7
+
+# Contador monotônico para desambiguar ids gerados no mesmo tick
+_id_counter = itertools.count()
+
+# Limite da fila de persistência; acima disso logs são descartados (backpressure)
+LOG_QUEUE_MAXSIZE = 4096
+
+# Máximo de entradas empacotadas em uma única linha log:batch:*
+LOG_BATCH_MAX_ENTRIES = 64
+
+# Flush do shard de índice em cache a cada N appends (ou na virada do dia)
+INDEX_FLUSH_EVERY = 32
+
+# Teto de shards de índice mantidos em cache no processo
+INDEX_CACHE_MAX_KEYS = 256
+
+# Tuning do SQLite/Turso para carga de escrita de logs:
+# WAL evita bloqueio leitor/escritor, synchronous=NORMAL corta fsyncs por
+# commit e busy_timeout absorve contenção em vez de falhar na hora
+_SQLITE_TUNING_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+)
 
 
 class LogLevel(str, Enum):
@@ -28,6 +69,24 @@ class LogLevel(str, Enum):
     CRITICAL = "critical"
 
 
+# Ordem numérica dos níveis para comparação barata no filtro
+_LEVEL_ORD = {
+    LogLevel.DEBUG: 10,
+    LogLevel.INFO: 20,
+    LogLevel.WARNING: 30,
+    LogLevel.ERROR: 40,
+    LogLevel.CRITICAL: 50,
+}
+
+
+def _min_level_from_env() -> LogLevel:
+    """Lê o nível mínimo de persistência do env QUIZ_LOG_LEVEL."""
+    try:
+        return LogLevel(os.getenv("QUIZ_LOG_LEVEL", "info").lower())
+    except ValueError:
+        return LogLevel.INFO
+
+
 class LogCategory(str, Enum):
     """Categorias de eventos."""
     WEBHOOK = "webhook"           # Recebimento de webhook
@@ -45,8 +104,14 @@ class LogCategory(str, Enum):
 class QuizLogEntry(BaseModel):
     """Entrada de log estruturada."""
 
-    id: str = Field(default_factory=lambda: datetime.now().strftime("%Y%m%d%H%M%S%f"))
-    timestamp: datetime = Field(default_factory=datetime.now)
+    model_config = ConfigDict(frozen=True)
+
+    # Tick em nanossegundos + contador: chaves log:{id} ficam ordenadas
+    # lexicograficamente por tempo e dois eventos no mesmo tick não colidem
+    id: str = Field(default_factory=lambda: f"{time.time_ns():020d}{next(_id_counter) & 0xFFFF:04x}")
+    # Fonte da verdade em ns (time_ns é bem mais barato que datetime.now);
+    # o datetime só é materializado quando alguém consome .timestamp
+    timestamp_ns: int = Field(default_factory=time.time_ns)
     level: LogLevel = LogLevel.INFO
     category: LogCategory
 
@@ -68,21 +133,144 @@ class QuizLogEntry(BaseModel):
     error: str | None = None
     error_traceback: str | None = None
 
+    @model_validator(mode="before")
+    @classmethod
+    def _legacy_timestamp(cls, data: Any) -> Any:
+        """Deriva timestamp_ns de linhas antigas (só traziam timestamp ISO)."""
+        if isinstance(data, dict) and "timestamp_ns" not in data and data.get("timestamp"):
+            try:
+                dt = datetime.fromisoformat(data["timestamp"])
+                data = {**data, "timestamp_ns": int(dt.timestamp() * 1_000_000_000)}
+            except (TypeError, ValueError):
+                pass
+        return data
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def timestamp(self) -> datetime:
+        """Timestamp como datetime (derivado de timestamp_ns sob demanda)."""
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9)
+
+
+def _date_str_from_ns(timestamp_ns: int) -> str:
+    """Data local YYYY-MM-DD a partir do tick, sem passar por datetime/strftime."""
+    lt = time.localtime(timestamp_ns // 1_000_000_000)
+    return f"{lt.tm_year:04d}-{lt.tm_mon:02d}-{lt.tm_mday:02d}"
+
+
+# Adapter memoizado: validate_python é o caminho rápido do pydantic-core
+# para reidratar entradas vindas do KVStore
+_LOG_ENTRY_ADAPTER: TypeAdapter[QuizLogEntry] = TypeAdapter(QuizLogEntry)
+
+# Tags de console pré-computadas (evita category.value.upper() por evento)
+_CATEGORY_TAGS = {category: f"[{category.value.upper()}]" for category in LogCategory}
+
+# Entrada sentinela devolvida quando o log é filtrado (nenhum I/O acontece)
+_NOOP_ENTRY = QuizLogEntry(category=LogCategory.SYSTEM, event="filtered", message="")
+
 
 class QuizLogger:
     """Logger estruturado para quiz usando AgentFS KVStore."""
 
-    def __init__(self, agentfs: "AgentFS"):
+    def __init__(self, agentfs: "AgentFS", min_level: LogLevel | None = None):
         """Inicializa logger com AgentFS.
 
         Args:
             agentfs: Instância do AgentFS
+            min_level: Nível mínimo persistido (default: env QUIZ_LOG_LEVEL ou INFO)
         """
         self._agentfs = agentfs
-        self._buffer: list[QuizLogEntry] = []
-        self._buffer_size = 10  # Flush a cada 10 logs
+        self._min_level_ord = _LEVEL_ORD[min_level or _min_level_from_env()]
+        # Fila de persistência: log() só enfileira; o worker drena para o KV
+        self._queue: asyncio.Queue[QuizLogEntry] = asyncio.Queue(maxsize=LOG_QUEUE_MAXSIZE)
+        self._worker_task: asyncio.Task | None = None
+        self._dropped = 0
+        self._storage_tuned = False
+        # Cache in-process dos shards de índice: eventos consecutivos caem
+        # quase sempre no mesmo shard (categoria, dia), então o kv.get por
+        # log vira um hit de dict; a escrita volta ao KV a cada
+        # INDEX_FLUSH_EVERY appends ou na virada do dia
+        self._index_cache: dict[str, list[str]] = {}
+        self._index_dirty: dict[str, int] = {}
+        self._cache_date: str | None = None
         logger.info("QuizLogger inicializado com AgentFS")
 
+    async def start(self) -> None:
+        """Aplica tuning de storage e sobe o worker de persistência."""
+        if not self._storage_tuned:
+            await self._tune_storage()
+        self._ensure_worker()
+
+    async def _tune_storage(self) -> None:
+        """Aplica pragmas de escrita no SQLite subjacente, se acessível.
+
+        O AgentFS nem sempre expõe a conexão crua; quando não expõe,
+        os defaults do SDK permanecem (best-effort, nunca falha).
+        """
+        self._storage_tuned = True
+        conn = None
+        for attr in ("db", "connection", "conn"):
+            conn = getattr(self._agentfs, attr, None) or getattr(self._agentfs.kv, attr, None)
+            if conn is not None and hasattr(conn, "execute"):
+                break
+            conn = None
+
+        if conn is None:
+            logger.debug("Conexão SQLite não exposta pelo AgentFS; pragmas não aplicados")
+            return
+
+        for pragma in _SQLITE_TUNING_PRAGMAS:
+            try:
+                result = conn.execute(pragma)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.debug(f"Pragma ignorado ({pragma}): {e}")
+        logger.info("Pragmas de tuning SQLite aplicados ao storage de logs")
+
+    def _ensure_worker(self) -> None:
+        """Inicia o worker de persistência (lazy: __init__ é síncrono)."""
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._worker())
+
+    async def _worker(self) -> None:
+        """Drena a fila e persiste entradas no KVStore.
+
+        Entradas acumuladas enquanto o worker escrevia são empacotadas em
+        uma única linha (envelope) em vez de N linhas individuais.
+        """
+        if not self._storage_tuned:
+            await self._tune_storage()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < LOG_BATCH_MAX_ENTRIES:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                if len(batch) == 1:
+                    await self._persist(batch[0])
+                else:
+                    await self._persist_batch(batch)
+            except Exception as e:
+                logger.error(f"Erro ao salvar log: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def flush(self) -> None:
+        """Aguarda a fila esvaziar e escreve os shards de índice pendentes."""
+        await self._queue.join()
+        await self._flush_all_indexes()
+
+    async def close(self) -> None:
+        """Flush final e encerramento do worker."""
+        await self.flush()
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            self._worker_task = None
+
     def _get_log_key(self, log_id: str) -> str:
         """Retorna chave do KVStore para um log."""
         return f"{KEY_PREFIX_LOG}{log_id}"
@@ -91,7 +279,15 @@ class QuizLogger:
         """Retorna chave do índice por categoria e data."""
         return f"{KEY_PREFIX_LOG_INDEX}{category.value}:{date}"
 
-    async def log(
+    def _get_compound_index_key(self, category: LogCategory, date: str, group_id: str) -> str:
+        """Retorna chave do índice composto (categoria, data, grupo)."""
+        return f"{KEY_PREFIX_LOG_INDEX}{category.value}:{date}:{group_id}"
+
+    def _get_group_index_key(self, group_id: str, date: str) -> str:
+        """Retorna chave do índice por grupo e data."""
+        return f"{KEY_PREFIX_LOG_GROUP_INDEX}{group_id}:{date}"
+
+    def fire(
         self,
         category: LogCategory,
         event: str,
@@ -106,7 +302,10 @@ class QuizLogger:
         error: str | None = None,
         error_traceback: str | None = None,
     ) -> QuizLogEntry:
-        """Registra um evento de log.
+        """Registra um evento de log sem tocar o event loop.
+
+        Síncrono de propósito: só valida nível, monta a entrada e enfileira;
+        o worker é quem paga o I/O. Caminho preferido em handlers quentes.
 
         Args:
             category: Categoria do evento
@@ -125,6 +324,10 @@ class QuizLogger:
         Returns:
             Entrada de log criada
         """
+        # Abaixo do nível mínimo: nem construção pydantic, nem I/O
+        if _LEVEL_ORD[level] < self._min_level_ord:
+            return _NOOP_ENTRY
+
         entry = QuizLogEntry(
             level=level,
             category=category,
@@ -140,36 +343,132 @@ class QuizLogger:
             error_traceback=error_traceback,
         )
 
-        # Salvar no KVStore
+        # Log no console para debug
+        log_msg = f"{_CATEGORY_TAGS[category]} {event}: {message}"
+        if group_id:
+            log_msg = f"[{group_id[:8]}] {log_msg}"
+
+        if level == LogLevel.ERROR or level == LogLevel.CRITICAL:
+            logger.error(log_msg)
+        elif level == LogLevel.WARNING:
+            logger.warning(log_msg)
+        else:
+            logger.info(log_msg)
+
+        # Enfileirar para persistência fora do caminho crítico da requisição
+        self._ensure_worker()
         try:
-            key = self._get_log_key(entry.id)
-            await self._agentfs.kv.set(key, entry.model_dump(mode="json"))
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self._dropped += 1
+            logger.warning(f"Fila de logs cheia, log descartado (total: {self._dropped})")
 
-            # Atualizar índice por categoria/data
-            date_str = entry.timestamp.strftime("%Y-%m-%d")
-            index_key = self._get_index_key(category, date_str)
+        return entry
 
-            # Adicionar ao índice
-            index = await self._agentfs.kv.get(index_key, default={"ids": []})
-            index["ids"].append(entry.id)
-            await self._agentfs.kv.set(index_key, index)
-
-            # Log também no console para debug
-            log_msg = f"[{category.value.upper()}] {event}: {message}"
-            if group_id:
-                log_msg = f"[{group_id[:8]}] {log_msg}"
-
-            if level == LogLevel.ERROR or level == LogLevel.CRITICAL:
-                logger.error(log_msg)
-            elif level == LogLevel.WARNING:
-                logger.warning(log_msg)
-            else:
-                logger.info(log_msg)
+    async def log(
+        self,
+        category: LogCategory,
+        event: str,
+        message: str,
+        level: LogLevel = LogLevel.INFO,
+        group_id: str | None = None,
+        user_id: str | None = None,
+        user_name: str | None = None,
+        quiz_id: str | None = None,
+        question_num: int | None = None,
+        data: dict | None = None,
+        error: str | None = None,
+        error_traceback: str | None = None,
+    ) -> QuizLogEntry:
+        """Versão async de fire() (compatibilidade com call sites que usam await)."""
+        return self.fire(
+            category=category,
+            event=event,
+            message=message,
+            level=level,
+            group_id=group_id,
+            user_id=user_id,
+            user_name=user_name,
+            quiz_id=quiz_id,
+            question_num=question_num,
+            data=data,
+            error=error,
+            error_traceback=error_traceback,
+        )
 
-        except Exception as e:
-            logger.error(f"Erro ao salvar log: {e}")
+    async def _persist(self, entry: QuizLogEntry) -> None:
+        """Persiste uma entrada e atualiza os índices no KVStore.
 
-        return entry
+        A escrita da linha de log não depende dos índices: dispara como task
+        enquanto o índice primário é lido, e todas as escritas pendentes são
+        aguardadas juntas — ~2x RTT em vez de 4-6 awaits em série.
+        """
+        key = self._get_log_key(entry.id)
+        log_set_task = asyncio.create_task(
+            self._agentfs.kv.set(key, entry.model_dump(mode="json", exclude_none=True))
+        )
+
+        date_str = _date_str_from_ns(entry.timestamp_ns)
+        await self._maybe_roll_cache(date_str)
+
+        # Índice por categoria/data + secundários por grupo (evita full scan
+        # em get_group_activity); appends vão para o cache in-process
+        appends = [
+            self._append_to_index(self._get_index_key(entry.category, date_str), entry.id)
+        ]
+        if entry.group_id:
+            appends.append(
+                self._append_to_index(
+                    self._get_compound_index_key(entry.category, date_str, entry.group_id),
+                    entry.id,
+                )
+            )
+            appends.append(
+                self._append_to_index(
+                    self._get_group_index_key(entry.group_id, date_str), entry.id
+                )
+            )
+
+        await asyncio.gather(log_set_task, *appends)
+
+    async def _persist_batch(self, batch: list[QuizLogEntry]) -> None:
+        """Empacota N entradas em uma única linha e atualiza índices em lote.
+
+        Os índices passam a referenciar entradas empacotadas como
+        "{batch_id}#{pos}"; ids simples continuam válidos para linhas antigas.
+        """
+        batch_id = batch[0].id
+        await self._agentfs.kv.set(
+            f"{KEY_PREFIX_LOG_BATCH}{batch_id}",
+            {
+                "ids": [entry.id for entry in batch],
+                "entries": [
+                    entry.model_dump(mode="json", exclude_none=True) for entry in batch
+                ],
+            },
+        )
+
+        # Agrupar refs por shard de índice: uma leitura+escrita por shard
+        shard_refs: dict[str, list[str]] = {}
+        for pos, entry in enumerate(batch):
+            ref = f"{batch_id}#{pos}"
+            date_str = _date_str_from_ns(entry.timestamp_ns)
+            shard_refs.setdefault(self._get_index_key(entry.category, date_str), []).append(ref)
+            if entry.group_id:
+                shard_refs.setdefault(
+                    self._get_compound_index_key(entry.category, date_str, entry.group_id), []
+                ).append(ref)
+                shard_refs.setdefault(
+                    self._get_group_index_key(entry.group_id, date_str), []
+                ).append(ref)
+
+        await self._maybe_roll_cache(_date_str_from_ns(batch[0].timestamp_ns))
+        for shard_key, refs in shard_refs.items():
+            ids = await self._cached_index_ids(shard_key)
+            ids.extend(refs)
+            self._index_dirty[shard_key] = self._index_dirty.get(shard_key, 0) + len(refs)
+            if self._index_dirty[shard_key] >= INDEX_FLUSH_EVERY:
+                await self._flush_index(shard_key)
 
     # === Métodos de conveniência ===
 
@@ -181,7 +480,7 @@ class QuizLogger:
         data: dict | None = None,
     ):
         """Log de webhook recebido."""
-        await self.log(
+        self.fire(
             category=LogCategory.WEBHOOK,
             event="webhook_received",
             message=f"Webhook {event_type} recebido",
@@ -198,10 +497,12 @@ class QuizLogger:
         quiz_id: str | None = None,
     ):
         """Log de mensagem recebida."""
-        await self.log(
+        # Truncar uma única vez; o texto completo segue em data["text"]
+        truncated = text if len(text) <= 50 else f"{text[:50]}..."
+        self.fire(
             category=LogCategory.MESSAGE,
             event="message_received",
-            message=f"Mensagem de {user_name}: '{text[:50]}...' " if len(text) > 50 else f"Mensagem de {user_name}: '{text}'",
+            message=f"Mensagem de {user_name}: '{truncated}'",
             group_id=group_id,
             user_id=user_id,
             user_name=user_name,
@@ -220,7 +521,7 @@ class QuizLogger:
         error: str | None = None,
     ):
         """Log de comando executado."""
-        await self.log(
+        self.fire(
             category=LogCategory.COMMAND,
             event="command_executed",
             message=f"Comando {command} por {user_name}" + (" (sucesso)" if success else f" (erro: {error})"),
@@ -241,7 +542,7 @@ class QuizLogger:
         quiz_id: str,
     ):
         """Log de quiz iniciado."""
-        await self.log(
+        self.fire(
             category=LogCategory.QUIZ,
             event="quiz_started",
             message=f"Quiz iniciado por {user_name}",
@@ -259,7 +560,7 @@ class QuizLogger:
         topic: str | None = None,
     ):
         """Log de pergunta enviada."""
-        await self.log(
+        self.fire(
             category=LogCategory.QUIZ,
             event="question_sent",
             message=f"Pergunta {question_num}/10 enviada" + (f" (tópico: {topic})" if topic else ""),
@@ -281,7 +582,7 @@ class QuizLogger:
         points: int,
     ):
         """Log de resposta recebida."""
-        await self.log(
+        self.fire(
             category=LogCategory.QUIZ,
             event="answer_received",
             message=f"{user_name} respondeu {answer} - {'✓ Correto' if is_correct else '✗ Errado'} ({points} pts)",
@@ -303,7 +604,7 @@ class QuizLogger:
         rag_results: int,
     ):
         """Log de dica solicitada."""
-        await self.log(
+        self.fire(
             category=LogCategory.QUIZ,
             event="hint_requested",
             message=f"Dica solicitada para P{question_num} (RAG: {rag_results} resultados)",
@@ -324,7 +625,7 @@ class QuizLogger:
         winner_score: int | None = None,
     ):
         """Log de quiz finalizado."""
-        await self.log(
+        self.fire(
             category=LogCategory.QUIZ,
             event="quiz_finished",
             message=f"Quiz finalizado ({participants} participantes)" + (f" - Vencedor: {winner} ({winner_score} pts)" if winner else ""),
@@ -340,7 +641,7 @@ class QuizLogger:
         user_name: str,
     ):
         """Log de participante cadastrado."""
-        await self.log(
+        self.fire(
             category=LogCategory.PARTICIPANT,
             event="participant_joined",
             message=f"Novo participante: {user_name}",
@@ -357,10 +658,11 @@ class QuizLogger:
         quiz_id: str | None = None,
     ):
         """Log de busca RAG."""
-        await self.log(
+        truncated = query if len(query) <= 50 else f"{query[:50]}..."
+        self.fire(
             category=LogCategory.RAG,
             event="rag_search",
-            message=f"Busca RAG: '{query[:50]}...' -> {results_count} resultados",
+            message=f"Busca RAG: '{truncated}' -> {results_count} resultados",
             group_id=group_id,
             quiz_id=quiz_id,
             data={"query": query, "results_count": results_count},
@@ -375,7 +677,7 @@ class QuizLogger:
         quiz_id: str | None = None,
     ):
         """Log de chamada LLM."""
-        await self.log(
+        self.fire(
             category=LogCategory.LLM,
             event="llm_call",
             message=f"LLM ({model}): {purpose}" + (f" [{tokens} tokens]" if tokens else ""),
@@ -394,7 +696,7 @@ class QuizLogger:
         quiz_id: str | None = None,
     ):
         """Log de erro."""
-        await self.log(
+        self.fire(
             category=LogCategory.ERROR,
             event="error",
             message=message,
@@ -406,8 +708,186 @@ class QuizLogger:
             error_traceback=traceback,
         )
 
+    async def _cached_index_ids(self, index_key: str) -> list[str]:
+        """Retorna a lista de ids de um shard, lendo do KV só no primeiro miss."""
+        ids = self._index_cache.get(index_key)
+        if ids is None:
+            if len(self._index_cache) >= INDEX_CACHE_MAX_KEYS:
+                await self._flush_all_indexes()
+            index = await self._agentfs.kv.get(index_key, default={"ids": []})
+            ids = index["ids"]
+            self._index_cache[index_key] = ids
+        return ids
+
+    async def _append_to_index(self, index_key: str, log_id: str) -> None:
+        """Adiciona id de log a um shard de índice (via cache, flush periódico)."""
+        ids = await self._cached_index_ids(index_key)
+        ids.append(log_id)
+        self._index_dirty[index_key] = self._index_dirty.get(index_key, 0) + 1
+        if self._index_dirty[index_key] >= INDEX_FLUSH_EVERY:
+            await self._flush_index(index_key)
+
+    async def _flush_index(self, index_key: str) -> None:
+        """Escreve um shard sujo de volta ao KV."""
+        ids = self._index_cache.get(index_key)
+        if ids is not None and self._index_dirty.get(index_key, 0) > 0:
+            self._index_dirty[index_key] = 0
+            await self._agentfs.kv.set(index_key, {"ids": ids})
+
+    async def _flush_all_indexes(self) -> None:
+        """Flush de todos os shards sujos e reset do cache."""
+        for index_key in list(self._index_cache):
+            await self._flush_index(index_key)
+        self._index_cache.clear()
+        self._index_dirty.clear()
+
+    async def _maybe_roll_cache(self, date_str: str) -> None:
+        """Na virada do dia, flusha tudo: shards antigos não recebem mais appends."""
+        if self._cache_date != date_str:
+            if self._cache_date is not None:
+                await self._flush_all_indexes()
+            self._cache_date = date_str
+
     # === Métodos de consulta ===
 
+    async def _resolve_log_ref(self, ref: str, batch_cache: dict[str, dict]) -> dict | None:
+        """Resolve uma referência de índice para o payload da entrada.
+
+        Refs "{batch_id}#{pos}" apontam para linhas empacotadas; ids simples
+        são linhas individuais (formato antigo e batches de 1 entrada).
+        """
+        if "#" not in ref:
+            return await self._agentfs.kv.get(self._get_log_key(ref))
+
+        batch_id, _, pos = ref.partition("#")
+        row = batch_cache.get(batch_id)
+        if row is None:
+            row = await self._agentfs.kv.get(f"{KEY_PREFIX_LOG_BATCH}{batch_id}") or {}
+            batch_cache[batch_id] = row
+        try:
+            return row["entries"][int(pos)]
+        except (KeyError, IndexError, ValueError):
+            return None
+
+    async def _iter_indexed_logs(
+        self,
+        index_key: str,
+        category: LogCategory | None = None,
+        group_id: str | None = None,
+    ) -> AsyncIterator[QuizLogEntry]:
+        """Itera logs de um shard de índice, do mais recente para o mais antigo.
+
+        As refs só são resolvidas conforme o consumidor pede: se o caller
+        para em 20 entradas, apenas ~20 leituras de KV acontecem.
+        """
+        batch_cache: dict[str, dict] = {}
+        # Cache primeiro: shards sujos em memória são superset do KV
+        ids = self._index_cache.get(index_key)
+        if ids is None:
+            index = await self._agentfs.kv.get(index_key, default={"ids": []})
+            ids = index["ids"]
+
+        for log_id in reversed(ids):
+            data = await self._resolve_log_ref(log_id, batch_cache)
+            if not data:
+                continue
+            entry = _LOG_ENTRY_ADAPTER.validate_python(data)
+            if category and entry.category != category:
+                continue
+            if group_id and entry.group_id != group_id:
+                continue
+            yield entry
+
+    async def iter_logs(
+        self,
+        category: LogCategory | None = None,
+        date: str | None = None,
+        group_id: str | None = None,
+        limit: int = 100,
+    ) -> AsyncIterator[QuizLogEntry]:
+        """Itera logs com filtros, do mais recente para o mais antigo.
+
+        Nos caminhos indexados o gerador tem memória limitada: nunca
+        materializa mais que ``limit`` entradas nem ordena nada — os ids
+        tick-ordenados (e os shards por dia) já entregam ordem
+        cronológica, basta percorrer ao contrário. Só o caminho sem
+        índice (_iter_all_logs) varre e ordena tudo.
+
+        Args:
+            category: Filtrar por categoria
+            date: Filtrar por data (YYYY-MM-DD)
+            group_id: Filtrar por grupo
+            limit: Máximo de entradas produzidas
+        """
+        count = 0
+
+        if category and date and group_id:
+            # Índice composto: match exato, sem filtro Python
+            source = self._iter_indexed_logs(
+                self._get_compound_index_key(category, date, group_id)
+            )
+        elif category and date:
+            source = self._iter_indexed_logs(
+                self._get_index_key(category, date), group_id=group_id
+            )
+        elif group_id and date:
+            source = self._iter_indexed_logs(
+                self._get_group_index_key(group_id, date), category=category
+            )
+        elif group_id:
+            # Sem data: varrer índices de grupo do dia atual para trás
+            for days_back in range(GROUP_INDEX_LOOKBACK_DAYS):
+                day = datetime.now() - timedelta(days=days_back)
+                async for entry in self._iter_indexed_logs(
+                    self._get_group_index_key(group_id, day.strftime("%Y-%m-%d")),
+                    category=category,
+                ):
+                    yield entry
+                    count += 1
+                    if count >= limit:
+                        return
+            return
+        else:
+            source = self._iter_all_logs(category)
+
+        async for entry in source:
+            yield entry
+            count += 1
+            if count >= limit:
+                return
+
+    async def _iter_all_logs(
+        self, category: LogCategory | None = None
+    ) -> AsyncIterator[QuizLogEntry]:
+        """Varre todas as linhas de log sem índice (caminho lento).
+
+        Ordena por timestamp_ns de verdade: ids novos (ns), ids legados
+        (strftime) e linhas log:batch:* vivem em faixas diferentes do
+        keyspace, então a ordem das chaves não é ordem cronológica aqui.
+        """
+        items = await self._agentfs.kv.list(KEY_PREFIX_LOG)
+        entries: list[QuizLogEntry] = []
+        for item in items:
+            key = item["key"]
+            if key.startswith(KEY_PREFIX_LOG_INDEX):
+                continue
+            if key.startswith(KEY_PREFIX_LOG_BATCH):
+                payloads = item["value"].get("entries", [])
+            elif key.startswith(KEY_PREFIX_LOG):
+                payloads = [item["value"]]
+            else:
+                continue
+
+            for payload in payloads:
+                entry = _LOG_ENTRY_ADAPTER.validate_python(payload)
+                if category and entry.category != category:
+                    continue
+                entries.append(entry)
+
+        entries.sort(key=lambda entry: entry.timestamp_ns, reverse=True)
+        for entry in entries:
+            yield entry
+
     async def get_logs(
         self,
         category: LogCategory | None = None,
@@ -415,7 +895,7 @@ class QuizLogger:
         group_id: str | None = None,
         limit: int = 100,
     ) -> list[QuizLogEntry]:
-        """Busca logs com filtros.
+        """Busca logs com filtros (versão materializada de iter_logs).
 
         Args:
             category: Filtrar por categoria
@@ -424,44 +904,18 @@ class QuizLogger:
             limit: Limite de resultados
 
         Returns:
-            Lista de logs
+            Lista de logs, do mais recente para o mais antigo
         """
-        logs = []
-
         try:
-            if category and date:
-                # Buscar por índice específico
-                index_key = self._get_index_key(category, date)
-                index = await self._agentfs.kv.get(index_key, default={"ids": []})
-
-                for log_id in index["ids"][-limit:]:
-                    key = self._get_log_key(log_id)
-                    data = await self._agentfs.kv.get(key)
-                    if data:
-                        entry = QuizLogEntry(**data)
-                        if group_id is None or entry.group_id == group_id:
-                            logs.append(entry)
-            else:
-                # Buscar todos os logs (mais lento)
-                items = await self._agentfs.kv.list(KEY_PREFIX_LOG)
-                for item in items[-limit:]:
-                    if item["key"].startswith(KEY_PREFIX_LOG) and not item["key"].startswith(KEY_PREFIX_LOG_INDEX):
-                        entry = QuizLogEntry(**item["value"])
-
-                        # Aplicar filtros
-                        if category and entry.category != category:
-                            continue
-                        if group_id and entry.group_id != group_id:
-                            continue
-
-                        logs.append(entry)
-
+            return [
+                entry
+                async for entry in self.iter_logs(
+                    category=category, date=date, group_id=group_id, limit=limit
+                )
+            ]
         except Exception as e:
             logger.error(f"Erro ao buscar logs: {e}")
-
-        # Ordenar por timestamp (mais recente primeiro)
-        logs.sort(key=lambda x: x.timestamp, reverse=True)
-        return logs[:limit]
+            return []
 
     async def get_recent_errors(self, limit: int = 20) -> list[QuizLogEntry]:
         """Busca erros recentes."""
@@ -473,17 +927,64 @@ class QuizLogger:
         return await self.get_logs(group_id=group_id, limit=limit)
 
 
-# Singleton global
+# Singleton global, inicializado no lifespan do FastAPI
 _quiz_logger: QuizLogger | None = None
 
 
-async def get_quiz_logger() -> QuizLogger:
-    """Obtém instância do QuizLogger."""
+class _NoopQuizLogger:
+    """Substituto inerte quando init_quiz_logger falhou no startup.
+
+    O lifespan tolera a falha do init (logging é infra auxiliar), então
+    o accessor precisa degradar do mesmo jeito: qualquer método do
+    QuizLogger vira um no-op awaitable em vez de um RuntimeError no
+    meio do fluxo do quiz.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        async def _noop(*args: Any, **kwargs: Any) -> None:
+            return None
+
+        return _noop
+
+
+_NOOP_QUIZ_LOGGER = _NoopQuizLogger()
+_noop_warned = False
+
+
+async def init_quiz_logger() -> QuizLogger:
+    """Inicializa o singleton no startup do app (lifespan).
+
+    Eager de propósito: resolve o AgentFS e sobe o worker uma única vez,
+    para que get_quiz_logger() vire um retorno de módulo-global sem await.
+    """
     global _quiz_logger
 
     if _quiz_logger is None:
         import app_state
         agentfs = await app_state.get_group_agentfs()
         _quiz_logger = QuizLogger(agentfs)
+        await _quiz_logger.start()
 
     return _quiz_logger
+
+
+def get_quiz_logger() -> QuizLogger:
+    """Obtém instância do QuizLogger (no-op se o init do lifespan falhou)."""
+    if _quiz_logger is None:
+        global _noop_warned
+        if not _noop_warned:
+            _noop_warned = True
+            logger.warning(
+                "QuizLogger não inicializado; logs de quiz descartados (no-op)"
+            )
+        return _NOOP_QUIZ_LOGGER  # type: ignore[return-value]
+    return _quiz_logger
+
+
+async def shutdown_quiz_logger() -> None:
+    """Flush e encerramento do logger no shutdown do app."""
+    global _quiz_logger
+
+    if _quiz_logger is not None:
+        await _quiz_logger.close()
+        _quiz_logger = None
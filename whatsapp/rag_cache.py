@@ -0,0 +1,67 @@
+"""Cache LRU+TTL para buscas RAG do fluxo WhatsApp.
+
+Consultas do quiz são altamente redundantes: a validação do START usa
+sempre a mesma string e dúvidas repetem as mesmas perguntas. Cachear o
+resultado por hash da query normalizada elimina um embed + busca ANN
+por hit, sem tocar no vector store.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Limites do cache: entradas LRU + validade de 1h por entrada
+RAG_CACHE_MAX_ENTRIES = 256
+RAG_CACHE_TTL_SECONDS = 3600.0
+
+# OrderedDict como LRU: move_to_end no hit, popitem(last=False) no evict
+_cache: OrderedDict[str, tuple[float, list[Any]]] = OrderedDict()
+
+
+def _cache_key(query: str, top_k: int) -> str:
+    """Chave estável por query normalizada (case/espaços) e top_k."""
+    normalized = " ".join(query.lower().split())
+    return hashlib.sha1(
+        f"{normalized}:{top_k}".encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+async def cached_rag_search(rag: Any, query: str, top_k: int = 3) -> list[Any]:
+    """Busca RAG com cache por query exata (normalizada).
+
+    Args:
+        rag: Instância RAG com método async search(query, top_k)
+        query: Texto da busca
+        top_k: Quantidade de resultados
+
+    Returns:
+        Resultados da busca (do cache quando dentro do TTL)
+    """
+    key = _cache_key(query, top_k)
+    now = time.monotonic()
+
+    hit = _cache.get(key)
+    if hit is not None:
+        cached_at, results = hit
+        if now - cached_at < RAG_CACHE_TTL_SECONDS:
+            _cache.move_to_end(key)
+            return results
+        del _cache[key]
+
+    results = await rag.search(query, top_k=top_k)
+
+    # Só cachear resultados não-vazios: base vazia pode estar sendo indexada
+    if results:
+        _cache[key] = (now, results)
+        while len(_cache) > RAG_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+    return results
+
+
+def invalidate_rag_cache() -> None:
+    """Limpa o cache (chamar após reindexar a base de conhecimento)."""
+    _cache.clear()
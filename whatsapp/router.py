@@ -3,20 +3,38 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import os
+from functools import lru_cache
+from typing import NamedTuple
 
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 
+try:
+    import orjson
+except ImportError:
+    # orjson não instalado - cai no parser stdlib
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    # msgspec não instalado - parse via dict com .get()
+    msgspec = None
+
 import app_state
 from quiz.engine.quiz_engine import QuizEngine
 from quiz.engine.scoring_engine import QuizScoringEngine
+from quiz.models.schemas import QuizQuestion
 
 from .constants import QUIZ_ENGINE_TIMEOUT
 from .evolution_client import EvolutionAPIClient, get_evolution_client
 from .message_formatter import WhatsAppFormatter
 from .models import EvolutionWebhookMessage, QuizFlowState, UserQuizState
+from .rag_cache import cached_rag_search
 from .user_state import UserStateManager
+from .welcome_router import SIGNATURE_HEADER, verify_webhook_signature
 
 logger = logging.getLogger(__name__)
 
@@ -26,27 +44,236 @@ router = APIRouter(prefix="/whatsapp", tags=["WhatsApp"])
 # SINGLETONS (Configuração global)
 # =============================================================================
 
-_state_manager: UserStateManager | None = None
 _formatter = WhatsAppFormatter()
 
+# Engine cacheado por instância de AgentFS (invalida quando a sessão muda)
+_quiz_engine: QuizEngine | None = None
+_quiz_engine_agentfs: object | None = None
+_quiz_engine_lock = asyncio.Lock()
+
+# Conjuntos de comandos pré-compilados (membership O(1) em vez de scan de lista)
+_ANSWER_CMDS = frozenset({"A", "B", "C", "D"})
+_HELP_CMDS = frozenset({"AJUDA", "HELP", "?"})
+_STOP_CMDS = frozenset({"PARAR", "STOP", "CANCELAR"})
+_START_CMDS = frozenset({"INICIAR", "START", "COMEÇAR"})
+_NEXT_CMDS = frozenset({"PROXIMA", "PRÓXIMA", "CONTINUAR", "NEXT"})
+_RESTART_CMDS = frozenset({"INICIAR", "START", "NOVAMENTE"})
+_RETURN_CMDS = frozenset({"A", "B", "C", "D", "VOLTAR", "CONTINUAR"})
+
+# Estados com quiz em andamento (cancelável via PARAR)
+_ACTIVE_STATES = frozenset({QuizFlowState.IN_QUIZ, QuizFlowState.IN_CHAT})
+
+# Template do prompt de dúvidas pré-montado no import: o bloco de
+# instruções é constante, só pergunta/opções/dúvida variam por mensagem
+_CHAT_PROMPT_TEMPLATE = """[CONTEXTO DO QUIZ]
+Pergunta atual: "{question}"
+Opções: {options}
+
+[DÚVIDA DO USUÁRIO]
+{doubt}
+
+[INSTRUÇÕES]
+1. Ajude o usuário a ENTENDER o conceito por trás da pergunta
+2. NÃO revele qual é a resposta correta
+3. NÃO diga que "não existe" algo se você não tiver certeza absoluta
+4. Se não souber a resposta exata, diga "consulte o regulamento oficial"
+5. NUNCA contradiga as opções apresentadas na pergunta
+6. Seja breve (2-3 frases) e educativo
+7. Ajude o usuário a raciocinar, não dê a resposta pronta"""
+
+# Opções formatadas por (quiz_id, pergunta): imutáveis, join feito uma vez
+_options_cache: dict[tuple[str, int], str] = {}
+_OPTIONS_CACHE_MAX = 1024
+
+def _prepare_text_template(text: str) -> bytes:
+    """Pré-serializa o payload sendText de uma resposta constante.
+
+    O %s resultante recebe o número do destinatário via bytes %, pulando
+    o json.dumps no caminho quente; % literais do texto são escapados.
+    """
+    body = json.dumps(
+        {"number": "@@NUMBER@@", "text": text, "delay": 1000}, ensure_ascii=False
+    )
+    return body.replace("%", "%%").replace("@@NUMBER@@", "%s").encode()
+
+
+# Respostas constantes pré-serializadas no import
+_TPL_WELCOME = _prepare_text_template(_formatter.format_welcome())
+_TPL_HELP = _prepare_text_template(_formatter.format_help())
+_TPL_CANCELLED = _prepare_text_template(_formatter.format_quiz_cancelled())
+_TPL_NO_ACTIVE_QUIZ = _prepare_text_template("Nenhum quiz ativo para cancelar.")
+_TPL_ANSWER_PROMPT = _prepare_text_template("Por favor, responda com *A*, *B*, *C* ou *D*")
+_TPL_FINISHED = _prepare_text_template("Quiz finalizado! Digite *INICIAR* para fazer novamente.")
+_TPL_BACK_TO_QUIZ = _prepare_text_template("Voltando ao quiz. Digite sua resposta (A/B/C/D).")
+
+# Lock por usuário: serializa mensagens do mesmo número sem bloquear os
+# demais (dois webhooks do mesmo usuário não podem ler/salvar estado em corrida)
+_user_locks: dict[str, asyncio.Lock] = {}
+_USER_LOCKS_MAX = 10_000
+
+
+def _user_lock(user_number: str) -> asyncio.Lock:
+    """Lock dedicado ao usuário; descarta locks ociosos quando o dict cresce."""
+    lock = _user_locks.get(user_number)
+    if lock is None:
+        if len(_user_locks) >= _USER_LOCKS_MAX:
+            for number, idle in list(_user_locks.items()):
+                if not idle.locked():
+                    del _user_locks[number]
+        lock = _user_locks.setdefault(user_number, asyncio.Lock())
+    return lock
+
+
+def _format_options(quiz_id: str, index: int, question: QuizQuestion) -> str:
+    """Linha de opções 'A) ... | B) ...' memoizada por pergunta."""
+    cache_key = (quiz_id, index)
+    formatted = _options_cache.get(cache_key)
+    if formatted is None:
+        formatted = " | ".join(f"{o.label}) {o.text}" for o in question.options)
+        if len(_options_cache) >= _OPTIONS_CACHE_MAX:
+            _options_cache.clear()
+        _options_cache[cache_key] = formatted
+    return formatted
+
+# Extratores de texto por messageType da Evolution API.
+# Tabela única pré-compilada em vez de cadeias if/elif repetidas por request.
+_TEXT_EXTRACTORS = {
+    "conversation": lambda m: m.get("conversation", ""),
+    "extendedTextMessage": lambda m: m.get("extendedTextMessage", {}).get("text", ""),
+    "buttonsResponseMessage": lambda m: m.get("buttonsResponseMessage", {}).get("selectedButtonId", ""),
+    "listResponseMessage": lambda m: (
+        m.get("listResponseMessage", {}).get("singleSelectReply", {}).get("selectedRowId", "")
+    ),
+}
+
+
+def _extract_text(message_type: str | None, message_data: dict) -> str:
+    """Extrai o texto da mensagem conforme o messageType."""
+    extractor = _TEXT_EXTRACTORS.get(message_type)
+    return extractor(message_data) if extractor else ""
+
+
+class _ParsedWebhook(NamedTuple):
+    """Campos do webhook Evolution que o roteamento realmente usa."""
+
+    event: str
+    message_type: str | None
+    remote_jid: str
+    from_me: bool
+    participant: str
+    push_name: str
+    message: dict
+
+
+if msgspec is not None:
+    # Decodificação tipada direto dos bytes: o schema dos webhooks Evolution
+    # é fixo, então um Struct com slots evita o dict intermediário e as
+    # cadeias de .get() por request. `message` fica cru porque os extratores
+    # de texto precisam de chaves arbitrárias por messageType.
+
+    class _EvolutionKey(msgspec.Struct, frozen=True, gc=False):
+        remoteJid: str = ""
+        fromMe: bool = False
+        participant: str = ""
+
+    class _EvolutionData(msgspec.Struct, frozen=True, gc=False):
+        key: _EvolutionKey | None = None
+        pushName: str = "Participante"
+        message: dict | None = None
+
+    class _EvolutionEvent(msgspec.Struct, frozen=True, gc=False):
+        event: str = ""
+        data: _EvolutionData | None = None
+
+    _WEBHOOK_DECODER = msgspec.json.Decoder(_EvolutionEvent)
+
+    def _parse_webhook_bytes(raw: bytes) -> _ParsedWebhook:
+        """Parseia o webhook com decoder tipado do msgspec."""
+        parsed = _WEBHOOK_DECODER.decode(raw)
+        data = parsed.data or _EvolutionData()
+        key = data.key or _EvolutionKey()
+        message = data.message or {}
+        return _ParsedWebhook(
+            event=parsed.event,
+            message_type=message.get("messageType"),
+            remote_jid=key.remoteJid,
+            from_me=key.fromMe,
+            participant=key.participant,
+            push_name=data.pushName,
+            message=message,
+        )
+
+else:
 
+    def _parse_webhook_bytes(raw: bytes) -> _ParsedWebhook:
+        """Parseia o webhook via dict (orjson quando disponível)."""
+        body = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        data = body.get("data", {})
+        key = data.get("key", {})
+        message = data.get("message", {})
+        return _ParsedWebhook(
+            event=body.get("event", ""),
+            message_type=message.get("messageType"),
+            remote_jid=key.get("remoteJid", ""),
+            from_me=bool(key.get("fromMe")),
+            participant=key.get("participant", ""),
+            push_name=data.get("pushName", "Participante"),
+            message=message,
+        )
+
+
+@lru_cache(maxsize=1)
 def get_state_manager() -> UserStateManager:
-    """Dependency: Gerenciador de estado."""
-    global _state_manager
-    if _state_manager is None:
-        _state_manager = UserStateManager()
-    return _state_manager
+    """Dependency: Gerenciador de estado (singleton)."""
+    return UserStateManager()
 
 
 async def get_quiz_engine() -> QuizEngine:
-    """Dependency: Quiz engine."""
+    """Dependency: Quiz engine (reutilizado enquanto o AgentFS não muda)."""
+    global _quiz_engine, _quiz_engine_agentfs
+
     agentfs = await app_state.get_agentfs()
-    rag = await app_state.get_rag()
-    return QuizEngine(agentfs=agentfs, rag=rag)
+    if _quiz_engine is None or _quiz_engine_agentfs is not agentfs:
+        # Lock só no primeiro init/troca de sessão; caminho quente não trava
+        async with _quiz_engine_lock:
+            if _quiz_engine is None or _quiz_engine_agentfs is not agentfs:
+                rag = await app_state.get_rag()
+                _quiz_engine = QuizEngine(agentfs=agentfs, rag=rag)
+                _quiz_engine_agentfs = agentfs
+    return _quiz_engine
+
+
+async def _get_engine() -> tuple[QuizEngine, QuizScoringEngine]:
+    """Par (engine, scoring) memoizado para os handlers de mensagem.
+
+    Evita 2-3 awaits em app_state e alocações de engine por mensagem;
+    o RAG fica acessível via engine.rag.
+    """
+    return await get_quiz_engine(), get_scoring_engine()
+
+
+async def _get_cached_question(
+    state: UserQuizState, engine: QuizEngine, index: int
+) -> QuizQuestion | None:
+    """Pergunta via cache do estado; busca no engine só no primeiro acesso.
+
+    Perguntas são imutáveis depois de geradas, então cada uma é lida do
+    store uma única vez por quiz e reaproveitada em resposta, avanço,
+    dúvidas e resultado final.
+    """
+    cached = state.questions_cache.get(str(index))
+    if cached is not None:
+        return QuizQuestion.model_validate(cached)
+
+    question = await engine.get_question(state.quiz_id, index, timeout=QUIZ_ENGINE_TIMEOUT)
+    if question is not None:
+        state.questions_cache[str(index)] = question.model_dump()
+    return question
 
 
+@lru_cache(maxsize=1)
 def get_scoring_engine() -> QuizScoringEngine:
-    """Dependency: Scoring engine."""
+    """Dependency: Scoring engine (stateless - singleton)."""
     return QuizScoringEngine()
 
 
@@ -55,6 +282,110 @@ def get_scoring_engine() -> QuizScoringEngine:
 # =============================================================================
 
 
+async def _process_group_if_allowed(
+    group_id: str,
+    user_id: str,
+    user_name: str,
+    text: str,
+) -> None:
+    """Checa whitelist e processa mensagem de grupo (roda em background).
+
+    A checagem de whitelist faz I/O no KV; mantê-la aqui deixa o ACK do
+    webhook sem nenhum await de storage no caminho da resposta.
+    """
+    from whatsapp.group_router import (
+        get_evolution_client as get_group_evolution,
+        get_group_manager,
+        process_group_message,
+    )
+
+    group_manager = await get_group_manager()
+
+    # Ignorar silenciosamente grupos não autorizados
+    if not await group_manager.is_group_allowed(group_id):
+        logger.debug(f"Grupo não autorizado (ignorando): {group_id}")
+        return
+
+    await process_group_message(
+        group_id=group_id,
+        user_id=user_id,
+        user_name=user_name,
+        text=text,
+        group_manager=group_manager,
+        evolution=get_group_evolution(),
+    )
+
+
+async def _dispatch_group_message(
+    parsed: _ParsedWebhook,
+    text: str,
+    background_tasks: BackgroundTasks,
+    state_manager: UserStateManager,
+    evolution: EvolutionAPIClient,
+) -> dict:
+    """Encaminha mensagem de grupo para o processador de grupos."""
+    participant = parsed.participant
+    user_id = participant.replace("@s.whatsapp.net", "") if participant else ""
+
+    background_tasks.add_task(
+        _process_group_if_allowed,
+        group_id=parsed.remote_jid,
+        user_id=user_id,
+        user_name=parsed.push_name,
+        text=text.strip(),
+    )
+    return {"status": "ok", "message": "redirected to group processor"}
+
+
+async def _dispatch_dm_message(
+    parsed: _ParsedWebhook,
+    text: str,
+    background_tasks: BackgroundTasks,
+    state_manager: UserStateManager,
+    evolution: EvolutionAPIClient,
+) -> dict:
+    """Agenda o processamento de mensagem direta em background."""
+    background_tasks.add_task(
+        process_message,
+        user_number=parsed.remote_jid.replace("@s.whatsapp.net", ""),
+        text=text.strip(),
+        state_manager=state_manager,
+        evolution=evolution,
+    )
+    return {"status": "ok", "message": "processing"}
+
+
+async def _handle_text_message(
+    parsed: _ParsedWebhook,
+    background_tasks: BackgroundTasks,
+    state_manager: UserStateManager,
+    evolution: EvolutionAPIClient,
+) -> dict:
+    """Handler de mensagens de texto (qualquer messageType com extrator)."""
+    # Ignorar mensagens enviadas por nós
+    if parsed.from_me:
+        return {"status": "ignored", "reason": "message from me"}
+
+    text = _extract_text(parsed.message_type, parsed.message)
+    if not text:
+        return {"status": "ignored", "reason": "no text in message"}
+
+    dispatch = _JID_DISPATCH[parsed.remote_jid.endswith("@g.us")]
+    return await dispatch(parsed, text, background_tasks, state_manager, evolution)
+
+
+# Despacho grupo vs DM resolvido por lookup em vez de branch inline
+_JID_DISPATCH = {True: _dispatch_group_message, False: _dispatch_dm_message}
+
+# Registro (event, messageType) -> handler, montado no import. O formato dos
+# webhooks da Evolution é fixo, então o filtro de evento/tipo vira um único
+# lookup de dict em vez de uma cadeia de ifs reavaliada por request.
+_WEBHOOK_HANDLERS = {
+    ("messages.upsert", message_type): _handle_text_message
+    for message_type in _TEXT_EXTRACTORS
+}
+
+
 @router.post("/webhook")
 async def evolution_webhook(
     request: Request,
@@ -72,99 +403,25 @@ async def evolution_webhook(
         "events": ["MESSAGES_UPSERT"]
     }
     """
-    try:
-        body = await request.json()
-        logger.debug(f"Webhook recebido: {body}")
-
-        # Parsear webhook
-        event = body.get("event")
-        data = body.get("data", {})
-
-        # Filtrar apenas mensagens recebidas (não enviadas por nós)
-        if event != "messages.upsert":
-            return {"status": "ignored", "reason": "event not messages.upsert"}
+    # Verificação antes do try: o 401 não deve ser engolido pelo
+    # catch-all abaixo
+    raw = await request.body()
+    if not verify_webhook_signature(raw, request.headers.get(SIGNATURE_HEADER)):
+        logger.warning("Assinatura de webhook inválida")
+        raise HTTPException(status_code=401, detail="Invalid signature")
 
-        # Extrair informações da mensagem
-        message_data = data.get("message", {})
-        key = data.get("key", {})
-
-        # Ignorar mensagens enviadas por nós
-        if key.get("fromMe"):
-            return {"status": "ignored", "reason": "message from me"}
-
-        # Extrair dados do remetente
-        remote_jid = key.get("remoteJid", "")
-
-        # === REDIRECIONAR MENSAGENS DE GRUPO ===
-        if remote_jid.endswith("@g.us"):
-            # É mensagem de grupo - verificar whitelist primeiro
-            from whatsapp.group_router import process_group_message, get_group_manager, get_evolution_client as get_group_evolution
-
-            group_id = remote_jid
-            group_manager = await get_group_manager()
-
-            # Ignorar silenciosamente grupos não autorizados
-            if not await group_manager.is_group_allowed(group_id):
-                logger.debug(f"Grupo não autorizado (ignorando): {group_id}")
-                return {"status": "ignored", "reason": "group not whitelisted"}
-
-            participant = key.get("participant", "")
-            user_id = participant.replace("@s.whatsapp.net", "") if participant else ""
-            user_name = data.get("pushName", "Participante")
-
-            # Extrair texto
-            message_type = message_data.get("messageType")
-            text = ""
-            if message_type == "conversation":
-                text = message_data.get("conversation", "")
-            elif message_type == "extendedTextMessage":
-                text = message_data.get("extendedTextMessage", {}).get("text", "")
-
-            if text:
-                group_evolution = get_group_evolution()
-                background_tasks.add_task(
-                    process_group_message,
-                    group_id=group_id,
-                    user_id=user_id,
-                    user_name=user_name,
-                    text=text.strip(),
-                    group_manager=group_manager,
-                    evolution=group_evolution,
-                )
-                return {"status": "ok", "message": "redirected to group processor"}
-            return {"status": "ignored", "reason": "group message without text"}
-        # === FIM REDIRECIONAMENTO ===
-
-        user_number = remote_jid.replace("@s.whatsapp.net", "")
-
-        # Extrair texto da mensagem
-        message_type = message_data.get("messageType")
-        text = ""
-
-        if message_type == "conversation":
-            text = message_data.get("conversation", "")
-        elif message_type == "extendedTextMessage":
-            text = message_data.get("extendedTextMessage", {}).get("text", "")
-        elif message_type in ["buttonsResponseMessage", "listResponseMessage"]:
-            # Resposta de botão ou lista
-            if message_type == "buttonsResponseMessage":
-                text = message_data.get("buttonsResponseMessage", {}).get("selectedButtonId", "")
-            else:
-                text = message_data.get("listResponseMessage", {}).get("singleSelectReply", {}).get("selectedRowId", "")
-
-        if not text:
-            return {"status": "ignored", "reason": "no text in message"}
-
-        # Processar mensagem em background
-        background_tasks.add_task(
-            process_message,
-            user_number=user_number,
-            text=text.strip(),
-            state_manager=state_manager,
-            evolution=evolution,
-        )
+    try:
+        parsed = _parse_webhook_bytes(raw)
+        logger.debug(f"Webhook recebido: {parsed.event}/{parsed.message_type}")
+
+        handler = _WEBHOOK_HANDLERS.get((parsed.event, parsed.message_type))
+        if handler is None:
+            return {
+                "status": "ignored",
+                "reason": f"no handler for ({parsed.event}, {parsed.message_type})",
+            }
 
-        return {"status": "ok", "message": "processing"}
+        return await handler(parsed, background_tasks, state_manager, evolution)
 
     except Exception as e:
         logger.error(f"Erro no webhook: {e}", exc_info=True)
@@ -194,42 +451,56 @@ async def process_message(
         # Normalizar texto
         text_upper = text.upper().strip()
 
-        # Buscar estado do usuário
-        state = state_manager.get_state(user_number)
+        async with _user_lock(user_number):
+            await _process_message_locked(
+                user_number, text, text_upper, state_manager, evolution
+            )
 
-        logger.info(
-            f"Processando mensagem de {user_number}: '{text}' (state: {state.flow_state})"
-        )
+    except Exception as e:
+        logger.error(f"Erro ao processar mensagem de {user_number}: {e}", exc_info=True)
+        await evolution.send_text(user_number, _formatter.format_error())
 
-        # Comandos globais (funcionam em qualquer estado)
-        if text_upper in ["AJUDA", "HELP", "?"]:
-            await evolution.send_text(user_number, _formatter.format_help())
-            return
 
-        if text_upper in ["PARAR", "STOP", "CANCELAR"]:
-            if state.flow_state in [QuizFlowState.IN_QUIZ, QuizFlowState.IN_CHAT]:
-                state_manager.reset_user(user_number)
-                await evolution.send_text(user_number, _formatter.format_quiz_cancelled())
-            else:
-                await evolution.send_text(user_number, "Nenhum quiz ativo para cancelar.")
-            return
-
-        # Fluxo baseado no estado
-        if state.flow_state == QuizFlowState.IDLE:
-            await handle_idle_state(user_number, text_upper, state, state_manager, evolution)
+async def _process_message_locked(
+    user_number: str,
+    text: str,
+    text_upper: str,
+    state_manager: UserStateManager,
+    evolution: EvolutionAPIClient,
+):
+    """Dispatch de estado; roda sob o lock do usuário."""
+    # Buscar estado do usuário
+    state = state_manager.get_state(user_number)
+
+    logger.info(
+        f"Processando mensagem de {user_number}: '{text}' (state: {state.flow_state})"
+    )
+
+    # Comandos globais (funcionam em qualquer estado)
+    if text_upper in _HELP_CMDS:
+        await evolution.send_text_bytes(user_number, _TPL_HELP)
+        return
+
+    if text_upper in _STOP_CMDS:
+        if state.flow_state in _ACTIVE_STATES:
+            state_manager.reset_user(user_number)
+            await evolution.send_text_bytes(user_number, _TPL_CANCELLED)
+        else:
+            await evolution.send_text_bytes(user_number, _TPL_NO_ACTIVE_QUIZ)
+        return
 
-        elif state.flow_state == QuizFlowState.IN_QUIZ:
-            await handle_in_quiz_state(user_number, text, text_upper, state, state_manager, evolution)
+    # Fluxo baseado no estado
+    if state.flow_state == QuizFlowState.IDLE:
+        await handle_idle_state(user_number, text_upper, state, state_manager, evolution)
 
-        elif state.flow_state == QuizFlowState.IN_CHAT:
-            await handle_in_chat_state(user_number, text, state, state_manager, evolution)
+    elif state.flow_state == QuizFlowState.IN_QUIZ:
+        await handle_in_quiz_state(user_number, text, text_upper, state, state_manager, evolution)
 
-        elif state.flow_state == QuizFlowState.FINISHED:
-            await handle_finished_state(user_number, text_upper, state, state_manager, evolution)
+    elif state.flow_state == QuizFlowState.IN_CHAT:
+        await handle_in_chat_state(user_number, text, text_upper, state, state_manager, evolution)
 
-    except Exception as e:
-        logger.error(f"Erro ao processar mensagem de {user_number}: {e}", exc_info=True)
-        await evolution.send_text(user_number, _formatter.format_error())
+    elif state.flow_state == QuizFlowState.FINISHED:
+        await handle_finished_state(user_number, text_upper, state, state_manager, evolution)
 
 
 # =============================================================================
@@ -245,15 +516,13 @@ async def handle_idle_state(
     evolution: EvolutionAPIClient,
 ):
     """Usuário sem quiz ativo."""
-    if text_upper in ["INICIAR", "START", "COMEÇAR"]:
+    if text_upper in _START_CMDS:
         # Iniciar novo quiz
         try:
-            agentfs = await app_state.get_agentfs()
-            rag = await app_state.get_rag()
-            engine = QuizEngine(agentfs=agentfs, rag=rag)
+            engine, _ = await _get_engine()
 
-            # Validar RAG
-            search_results = await rag.search("programa Renda Extra Ton", top_k=3)
+            # Validar RAG (query constante - sempre hit de cache após a primeira)
+            search_results = await cached_rag_search(engine.rag, "programa Renda Extra Ton", top_k=3)
             if not search_results:
                 await evolution.send_text(
                     user_number,
@@ -272,12 +541,15 @@ async def handle_idle_state(
             state.flow_state = QuizFlowState.IN_QUIZ
             state.answers = []
             state.score = 0
+            state.questions_cache = {"1": first_question.model_dump()}
             state_manager.save_state(state)
 
-            # Enviar primeira pergunta
-            await evolution.send_text(user_number, "🎯 *Quiz Iniciado!*\n\nPrepare-se...")
-            await asyncio.sleep(1)
-            msg = _formatter.format_question(first_question, 1)
+            # Intro + primeira pergunta em uma única mensagem: um só
+            # round-trip HTTP à Evolution e sem sleep artificial
+            msg = (
+                "🎯 *Quiz Iniciado!*\n\nPrepare-se...\n\n"
+                + _formatter.format_question(first_question, 1)
+            )
             await evolution.send_text(user_number, msg)
 
         except Exception as e:
@@ -285,7 +557,7 @@ async def handle_idle_state(
             await evolution.send_text(user_number, _formatter.format_error("Erro ao iniciar quiz. Tente novamente."))
     else:
         # Primeira interação ou comando desconhecido
-        await evolution.send_text(user_number, _formatter.format_welcome())
+        await evolution.send_text_bytes(user_number, _TPL_WELCOME)
 
 
 async def handle_in_quiz_state(
@@ -298,15 +570,12 @@ async def handle_in_quiz_state(
 ):
     """Usuário no meio do quiz."""
     # Verificar se é resposta (A, B, C, D)
-    if text_upper in ["A", "B", "C", "D"]:
+    if text_upper in _ANSWER_CMDS:
         await handle_answer(user_number, text_upper, state, state_manager, evolution)
-    elif text_upper in ["PROXIMA", "PRÓXIMA", "CONTINUAR", "NEXT"]:
+    elif text_upper in _NEXT_CMDS:
         await send_next_question(user_number, state, state_manager, evolution)
     else:
-        await evolution.send_text(
-            user_number,
-            "Por favor, responda com *A*, *B*, *C* ou *D*"
-        )
+        await evolution.send_text_bytes(user_number, _TPL_ANSWER_PROMPT)
 
 
 async def handle_answer(
@@ -318,47 +587,55 @@ async def handle_answer(
 ):
     """Processa resposta do usuário."""
     try:
-        agentfs = await app_state.get_agentfs()
-        rag = await app_state.get_rag()
-        engine = QuizEngine(agentfs=agentfs, rag=rag)
-        scoring = QuizScoringEngine()
+        engine, _ = await _get_engine()
 
-        # Buscar pergunta atual
-        question = await engine.get_question(state.quiz_id, state.current_question, timeout=QUIZ_ENGINE_TIMEOUT)
+        # Buscar pergunta atual (cacheada no estado após o primeiro acesso)
+        question = await _get_cached_question(state, engine, state.current_question)
         if not question:
             await evolution.send_text(user_number, _formatter.format_error("Erro ao carregar pergunta."))
             return
 
-        # Converter resposta para índice (A=0, B=1, C=2, D=3)
-        answer_index = {"A": 0, "B": 1, "C": 2, "D": 3}[answer]
+        # Converter resposta para índice (A=0, B=1, C=2, D=3); o caller já
+        # validou que answer está em _ANSWER_CMDS
+        answer_index = ord(answer) - 65
 
-        # Avaliar resposta
-        result = scoring.evaluate_answer(question, answer_index)
+        # Avaliar inline: comparação + aritmética, sem dict de resultado
+        is_correct = answer_index == question.correct_index
 
         # Salvar resposta
         state.answers.append(answer_index)
-        if result["is_correct"]:
-            state.score += result["points_earned"]
+        state.score += question.points * is_correct
         state_manager.save_state(state)
 
         # Enviar feedback
-        correct_opt = None
-        if not result["is_correct"]:
+        if is_correct:
+            correct_opt_text = None
+        else:
             correct_opt = question.options[question.correct_index]
             correct_opt_text = f"{correct_opt.label}) {correct_opt.text}"
-        else:
-            correct_opt_text = None
 
         feedback_msg = _formatter.format_feedback(
-            is_correct=result["is_correct"],
-            explanation=result["explanation"],
+            is_correct=is_correct,
+            explanation=question.explanation,
             correct_answer=correct_opt_text,
         )
-        await evolution.send_text(user_number, feedback_msg)
-
-        # Se foi a última pergunta, mostrar resultado
+        # Na última pergunta, sobrepor só o cálculo do resultado com o
+        # envio do feedback; os dois sends para o mesmo usuário saem em
+        # sequência — concorrentes, podiam cair no mesmo flush do batcher
+        # e entregar o resultado antes do feedback
         if state.current_question >= 10:
-            await send_final_results(user_number, state, state_manager, evolution)
+            _, result_msg = await asyncio.gather(
+                evolution.send_text(user_number, feedback_msg),
+                _compute_final_results(state, state_manager),
+            )
+            if result_msg is None:
+                await evolution.send_text(
+                    user_number, _formatter.format_error("Erro ao calcular resultado.")
+                )
+            else:
+                await evolution.send_text(user_number, result_msg)
+        else:
+            await evolution.send_text(user_number, feedback_msg)
 
     except Exception as e:
         logger.error(f"Erro ao processar resposta: {e}", exc_info=True)
@@ -388,11 +665,9 @@ async def send_next_question(
         state_manager.save_state(state)
 
         # Buscar próxima pergunta
-        agentfs = await app_state.get_agentfs()
-        rag = await app_state.get_rag()
-        engine = QuizEngine(agentfs=agentfs, rag=rag)
+        engine, _ = await _get_engine()
 
-        question = await engine.get_question(state.quiz_id, state.current_question, timeout=QUIZ_ENGINE_TIMEOUT)
+        question = await _get_cached_question(state, engine, state.current_question)
         if not question:
             await evolution.send_text(user_number, _formatter.format_error("Erro ao carregar próxima pergunta."))
             return
@@ -401,11 +676,59 @@ async def send_next_question(
         msg = _formatter.format_question(question, state.current_question)
         await evolution.send_text(user_number, msg)
 
+        # Persistir a pergunta recém-cacheada no estado
+        state_manager.save_state(state)
+
     except Exception as e:
         logger.error(f"Erro ao enviar próxima pergunta: {e}", exc_info=True)
         await evolution.send_text(user_number, _formatter.format_error())
 
 
+async def _compute_final_results(
+    state: UserQuizState,
+    state_manager: UserStateManager,
+) -> str | None:
+    """Calcula o resultado final e devolve a mensagem formatada.
+
+    Separado do envio para o cálculo poder sobrepor outro send em
+    andamento sem deixar a ordem de entrega das mensagens ao acaso.
+
+    Returns:
+        Mensagem de resultado, ou None se as perguntas não carregaram
+    """
+    engine, scoring = await _get_engine()
+
+    # Preferir o cache do estado; só vai ao store se faltar alguma
+    cached = [state.questions_cache.get(str(i)) for i in range(1, 11)]
+    if all(cached):
+        questions = [QuizQuestion.model_validate(c) for c in cached]
+    else:
+        questions = [
+            q for q in await engine.store.get_questions(state.quiz_id, range(1, 11)) if q
+        ]
+
+    if len(questions) != 10:
+        return None
+
+    # Calcular resultado
+    result = scoring.calculate_score(questions, state.answers)
+
+    # Atualizar estado
+    state.flow_state = QuizFlowState.FINISHED
+    state_manager.save_state(state)
+
+    return _formatter.format_results(
+        score=result["score"],
+        max_score=result["max_score"],
+        correct=result["correct_answers"],
+        total=result["total_questions"],
+        percentage=result["percentage"],
+        rank=result["rank"],
+        rank_title=result["rank_title"],
+        rank_message=result["rank_message"],
+    )
+
+
 async def send_final_results(
     user_number: str,
     state: UserQuizState,
@@ -414,40 +737,10 @@ async def send_final_results(
 ):
     """Calcula e envia resultado final."""
     try:
-        agentfs = await app_state.get_agentfs()
-        rag = await app_state.get_rag()
-        engine = QuizEngine(agentfs=agentfs, rag=rag)
-        scoring = QuizScoringEngine()
-
-        # Buscar todas as perguntas
-        questions = []
-        for i in range(1, 11):
-            q = await engine.store.get_question(state.quiz_id, i)
-            if q:
-                questions.append(q)
-
-        if len(questions) != 10:
+        result_msg = await _compute_final_results(state, state_manager)
+        if result_msg is None:
             await evolution.send_text(user_number, _formatter.format_error("Erro ao calcular resultado."))
             return
-
-        # Calcular resultado
-        result = scoring.calculate_score(questions, state.answers)
-
-        # Atualizar estado
-        state.flow_state = QuizFlowState.FINISHED
-        state_manager.save_state(state)
-
-        # Enviar resultado
-        result_msg = _formatter.format_results(
-            score=result["score"],
-            max_score=result["max_score"],
-            correct=result["correct_answers"],
-            total=result["total_questions"],
-            percentage=result["percentage"],
-            rank=result["rank"],
-            rank_title=result["rank_title"],
-            rank_message=result["rank_message"],
-        )
         await evolution.send_text(user_number, result_msg)
 
     except Exception as e:
@@ -464,31 +757,19 @@ async def handle_chat_question(
     """Processa dúvida do usuário via chat."""
     try:
         # Buscar contexto da pergunta atual
-        agentfs = await app_state.get_agentfs()
-        rag = await app_state.get_rag()
-        engine = QuizEngine(agentfs=agentfs, rag=rag)
+        engine, _ = await _get_engine()
 
-        current_q = await engine.get_question(state.quiz_id, state.current_question, timeout=QUIZ_ENGINE_TIMEOUT)
+        current_q = await _get_cached_question(state, engine, state.current_question)
         if not current_q:
             await evolution.send_text(user_number, _formatter.format_error("Erro ao buscar pergunta."))
             return
 
-        # Montar contexto para o chat
-        context_prompt = f"""[CONTEXTO DO QUIZ]
-Pergunta atual: "{current_q.question}"
-Opções: {" | ".join(f"{o.label}) {o.text}" for o in current_q.options)}
-
-[DÚVIDA DO USUÁRIO]
-{question}
-
-[INSTRUÇÕES]
-1. Ajude o usuário a ENTENDER o conceito por trás da pergunta
-2. NÃO revele qual é a resposta correta
-3. NÃO diga que "não existe" algo se você não tiver certeza absoluta
-4. Se não souber a resposta exata, diga "consulte o regulamento oficial"
-5. NUNCA contradiga as opções apresentadas na pergunta
-6. Seja breve (2-3 frases) e educativo
-7. Ajude o usuário a raciocinar, não dê a resposta pronta"""
+        # Montar contexto para o chat a partir do template pré-compilado
+        context_prompt = _CHAT_PROMPT_TEMPLATE.format(
+            question=current_q.question,
+            options=_format_options(state.quiz_id, state.current_question, current_q),
+            doubt=question,
+        )
 
         # Usar cliente de chat do backend
         client = await app_state.get_client()
@@ -516,24 +797,23 @@ Opções: {" | ".join(f"{o.label}) {o.text}" for o in current_q.options)}
 async def handle_in_chat_state(
     user_number: str,
     text: str,
+    text_upper: str,
     state: UserQuizState,
     state_manager: UserStateManager,
     evolution: EvolutionAPIClient,
 ):
     """Usuário em modo chat de dúvidas."""
-    text_upper = text.upper().strip()
-
     # Verificar se quer voltar ao quiz
-    if text_upper in ["A", "B", "C", "D", "VOLTAR", "CONTINUAR"]:
+    if text_upper in _RETURN_CMDS:
         # Voltar ao quiz
         state.flow_state = QuizFlowState.IN_QUIZ
         state_manager.save_state(state)
 
-        if text_upper in ["A", "B", "C", "D"]:
+        if text_upper in _ANSWER_CMDS:
             # Processar resposta
             await handle_answer(user_number, text_upper, state, state_manager, evolution)
         else:
-            await evolution.send_text(user_number, "Voltando ao quiz. Digite sua resposta (A/B/C/D).")
+            await evolution.send_text_bytes(user_number, _TPL_BACK_TO_QUIZ)
     else:
         # Continuar chat
         await handle_chat_question(user_number, text, state, evolution)
@@ -547,12 +827,13 @@ async def handle_finished_state(
     evolution: EvolutionAPIClient,
 ):
     """Quiz finalizado."""
-    if text_upper in ["INICIAR", "START", "NOVAMENTE"]:
-        # Resetar e iniciar novo quiz
-        state_manager.reset_user(user_number)
-        await handle_idle_state(user_number, "INICIAR", state_manager.get_state(user_number), state_manager, evolution)
+    if text_upper in _RESTART_CMDS:
+        # Estado zerado em memória; o único save acontece quando o novo
+        # quiz inicia dentro de handle_idle_state
+        fresh_state = state_manager.new_state(user_number)
+        await handle_idle_state(user_number, "INICIAR", fresh_state, state_manager, evolution)
     else:
-        await evolution.send_text(user_number, "Quiz finalizado! Digite *INICIAR* para fazer novamente.")
+        await evolution.send_text_bytes(user_number, _TPL_FINISHED)
 
 
 # =============================================================================
@@ -592,20 +873,8 @@ async def configure_webhook(
 @router.get("/active-users")
 async def get_active_users(state_manager: UserStateManager = Depends(get_state_manager)):
     """Lista usuários com quiz ativo."""
-    active = state_manager.get_active_users()
-    return {
-        "total": len(active),
-        "users": [
-            {
-                "user_id": u.user_id,
-                "quiz_id": u.quiz_id,
-                "current_question": u.current_question,
-                "score": u.score,
-                "flow_state": u.flow_state,
-            }
-            for u in active
-        ],
-    }
+    users = state_manager.list_active_projections()
+    return {"total": len(users), "users": users}
 
 
 @router.post("/reset-user/{user_number}")
@@ -2,22 +2,192 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
-from datetime import datetime
-from typing import TYPE_CHECKING
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, AsyncIterator
+
+try:
+    import orjson
+except ImportError:
+    # orjson não instalado - cai no json stdlib
+    orjson = None
 
 if TYPE_CHECKING:
     from agentfs_sdk import AgentFS
 
-from .user_models import UserProfile, UserStatus, WelcomeConfig
+from .user_models import ConversationMessage, UserProfile, UserStatus, WelcomeConfig
 
 logger = logging.getLogger(__name__)
 
+# Decode de JSON já serializado: orjson quando disponível (C)
+_loads = orjson.loads if orjson is not None else json.loads
+
+# A partir deste tamanho de lote, a desserialização de perfis sai do
+# event loop (to_thread): queries de admin não param os webhooks
+PARSE_OFFLOAD_MIN = 64
+PARSE_CHUNK_SIZE = 64
+
+# Versão do layout gravado no KV: leituras com a versão corrente pulam a
+# validação do pydantic (o dado saiu do nosso próprio model_dump)
+SCHEMA_VERSION = 2
+
+# Janela de debounce dos saves de mensagem: uma rajada de mensagens do
+# mesmo usuário vira uma única escrita de perfil (só o estado final),
+# em vez de um round-trip ao KVStore por mensagem
+SAVE_DEBOUNCE_SECONDS = 2.0
+
+
+def _revive_dt(value: Any) -> datetime | None:
+    """Converte ISO string de volta para datetime (fromisoformat é C)."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _profile_from_trusted(data: dict) -> UserProfile:
+    """Reconstrói UserProfile de um dump nosso sem rodar validadores.
+
+    model_construct não valida nem coage tipos, então os poucos campos
+    não JSON-nativos (datetimes e sets) são revividos à mão.
+    """
+    history = [
+        ConversationMessage.model_construct(
+            role=m["role"],
+            content=m["content"],
+            timestamp=_revive_dt(m.get("timestamp")),
+        )
+        for m in data.get("conversation_history") or ()
+    ]
+    return UserProfile.model_construct(
+        user_id=data["user_id"],
+        phone_number=data.get("phone_number", ""),
+        display_name=data.get("display_name", ""),
+        status=UserStatus(data.get("status", "new")),
+        first_seen_at=_revive_dt(data.get("first_seen_at")),
+        last_interaction_at=_revive_dt(data.get("last_interaction_at")),
+        last_dm_sent_at=_revive_dt(data.get("last_dm_sent_at")),
+        group_ids=set(data.get("group_ids") or ()),
+        welcomed_groups=set(data.get("welcomed_groups") or ()),
+        group_meta=data.get("group_meta") or {},
+        conversation_history=history,
+        archived_chunks=data.get("archived_chunks", 0),
+        metadata=data.get("metadata") or {},
+        total_messages_sent=data.get("total_messages_sent", 0),
+        total_messages_received=data.get("total_messages_received", 0),
+    )
+
+
+def _parse_profile(data: dict) -> UserProfile:
+    """Desserializa um perfil vindo do KVStore.
+
+    Dump na versão corrente usa o caminho rápido (sem validação);
+    versões antigas ou dados inesperados caem no model_validate, que
+    também cuida das migrações de layout.
+    """
+    if data.get("_v") == SCHEMA_VERSION:
+        try:
+            return _profile_from_trusted(data)
+        except Exception as e:
+            logger.debug("Fast-path de perfil falhou, validando: %s", e)
+    return UserProfile.model_validate(data)
+
+
+def _parse_profile_chunk(rows: list[dict]) -> list[UserProfile | None]:
+    """Desserializa um lote de perfis (roda em worker thread)."""
+    parsed: list[UserProfile | None] = []
+    for data in rows:
+        try:
+            parsed.append(_parse_profile(data))
+        except Exception as e:
+            logger.error("Erro ao parsear usuário: %s", e)
+            parsed.append(None)
+    return parsed
+
+
 # Prefixos de chave no KVStore
 KEY_PREFIX_USER = "user:profile:"
 KEY_PREFIX_WELCOME_CONFIG = "user:welcome_config:"
+KEY_PREFIX_HISTORY = "user:history:"
 KEY_WELCOMED_USERS = "user:welcomed_set"
 
+# Índices secundários: listas de user_ids mantidas junto com cada escrita,
+# para as queries não precisarem varrer todos os perfis (kv.list é O(N))
+KEY_PREFIX_IDX_GROUP = "idx:group:"
+KEY_PREFIX_IDX_UNWELCOMED = "idx:unwelcomed:"
+KEY_PREFIX_IDX_ACTIVE_DAY = "idx:active_day:"
+# Marcador do backfill: perfis gravados antes dos índices existirem são
+# varridos uma única vez para semear idx:*/stats:*
+KEY_IDX_BACKFILLED = "idx:backfilled"
+
+# Contadores agregados: get_stats vira leitura O(1) dessas chaves
+KEY_STAT_TOTAL_USERS = "stats:total_users"
+KEY_STAT_TOTAL_MESSAGES = "stats:total_messages"
+KEY_STAT_WELCOMED = "stats:welcomed"
+KEY_STAT_ENGAGED = "stats:engaged"
+
+# Limites dos caches em memória: o tráfego concentra nos usuários
+# recentes, então um LRU limitado mantém o hot set sem RSS crescer
+# indefinidamente (cada perfil carrega histórico de conversa)
+USER_CACHE_MAX = 10_000
+WELCOME_CONFIG_CACHE_MAX = 1_024
+
+# Configs de welcome mudam raramente, mas podem mudar em outro worker:
+# o cache serve rajadas da memória e revalida no KV após o TTL
+WELCOME_CONFIG_TTL_SECONDS = 60.0
+
+# Pragmas de escrita para o SQLite/libSQL por trás do KVStore: WAL não
+# bloqueia leitores durante save_user, e synchronous=NORMAL dispensa o
+# fsync por commit (seguro com WAL)
+_SQLITE_TUNING_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class _KVTransaction:
+    """Buffer de escritas no KVStore: acumula sets e grava tudo de uma vez.
+
+    Cada set/get no KVStore remoto (Turso/libSQL) é um round-trip de rede.
+    Eventos como "usuário entrou no grupo" geram 2-3 escritas (perfil,
+    índice, contador); bufferizar e dar flush em lote paga um único RTT.
+    """
+
+    def __init__(self, kv: Any):
+        self._kv = kv
+        self._pending: dict[str, Any] = {}
+
+    async def get(self, key: str) -> Any:
+        """Lê uma chave, enxergando escritas ainda não flushadas."""
+        if key in self._pending:
+            return self._pending[key]
+        return await self._kv.get(key)
+
+    async def set(self, key: str, value: Any) -> None:
+        """Bufferiza a escrita (gravada apenas no flush)."""
+        self._pending[key] = value
+
+    async def flush(self) -> None:
+        """Grava todas as escritas pendentes em um único lote."""
+        if not self._pending:
+            return
+        items = list(self._pending.items())
+        self._pending.clear()
+        # SDKs mais novos expõem batch_set (um statement em lote no libSQL);
+        # sem ele, pelo menos despachar os sets concorrentemente
+        batch_set = getattr(self._kv, "batch_set", None)
+        if batch_set is not None:
+            await batch_set(dict(items))
+        else:
+            await asyncio.gather(*(self._kv.set(k, v) for k, v in items))
+
 
 class UserManagerKV:
     """Gerencia usuários individuais usando KVStore (Turso/SQLite)."""
@@ -29,8 +199,39 @@ class UserManagerKV:
             agentfs: Instância do AgentFS
         """
         self._agentfs = agentfs
-        self._cache: dict[str, UserProfile] = {}
-        self._welcome_configs: dict[str, WelcomeConfig] = {}
+        # LRU: acesso move para o fim, overflow descarta o mais antigo
+        self._cache: OrderedDict[str, UserProfile] = OrderedDict()
+        # Configs de welcome: LRU com timestamp de gravação (TTL)
+        self._welcome_configs: OrderedDict[str, tuple[float, WelcomeConfig]] = (
+            OrderedDict()
+        )
+        # Último JSON gravado por usuário: permite pular writes redundantes
+        self._last_saved: dict[str, str] = {}
+        # Leituras em andamento por usuário (single-flight no get_user)
+        self._inflight: dict[str, asyncio.Future[UserProfile]] = {}
+        # Pares "user_id:group_id" já welcomed: no regime estável a
+        # resposta de should_send_welcome é quase sempre "não", e este
+        # set responde isso sem tocar perfil nem KV
+        self._welcomed_pairs: set[str] = set()
+        # Saves de perfil adiados (debounce por usuário) e deltas de
+        # contadores acumulados, drenados juntos no flush
+        self._save_handles: dict[str, asyncio.TimerHandle] = {}
+        self._stat_deltas: dict[str, int] = {}
+        # Usuários já registrados no índice de atividade do dia corrente
+        self._active_day = ""
+        self._active_day_marked: set[str] = set()
+        # Índices e contadores são read-modify-write em chaves
+        # compartilhadas: o lock por chave serializa escritores
+        # concorrentes (joins em paralelo via gather) e o último valor
+        # mutado fica em memória como fonte da verdade — um set
+        # bufferizado em transação ainda não é visível no KV para a
+        # mutação seguinte
+        self._mutation_locks: dict[str, asyncio.Lock] = {}
+        self._mutated_values: dict[str, Any] = {}
+        # Backfill dos índices para dados pré-índice (uma vez por KV)
+        self._indexes_ready = False
+        self._backfill_lock = asyncio.Lock()
+        self._pragmas_applied = False
         logger.info("UserManagerKV inicializado com AgentFS")
 
     def _get_user_key(self, user_id: str) -> str:
@@ -41,6 +242,252 @@ class UserManagerKV:
         """Retorna chave do KVStore para config de welcome do grupo."""
         return f"{KEY_PREFIX_WELCOME_CONFIG}{group_id}"
 
+    def _cache_get(self, user_id: str) -> UserProfile | None:
+        """Lê do cache LRU, renovando a posição do perfil."""
+        user = self._cache.get(user_id)
+        if user is not None:
+            self._cache.move_to_end(user_id)
+        return user
+
+    def _cache_put(self, user: UserProfile) -> None:
+        """Insere no cache LRU, descartando o menos recente no overflow."""
+        self._cache[user.user_id] = user
+        self._cache.move_to_end(user.user_id)
+        # Semear o atalho de welcomed com o que o perfil já sabe
+        for group_id in user.welcomed_groups:
+            self._welcomed_pairs.add(f"{user.user_id}:{group_id}")
+        while len(self._cache) > USER_CACHE_MAX:
+            evicted_id, _ = self._cache.popitem(last=False)
+            self._last_saved.pop(evicted_id, None)
+
+    def _config_cache_put(self, config: WelcomeConfig) -> None:
+        """Insere config de welcome no cache LRU limitado (TTL renovado)."""
+        self._welcome_configs[config.group_id] = (time.monotonic(), config)
+        self._welcome_configs.move_to_end(config.group_id)
+        while len(self._welcome_configs) > WELCOME_CONFIG_CACHE_MAX:
+            self._welcome_configs.popitem(last=False)
+
+    async def configure_pragmas(self) -> None:
+        """Aplica pragmas de tuning no SQLite/libSQL do KVStore (best-effort).
+
+        Chamado de forma lazy no primeiro acesso: __init__ é síncrono e o
+        SDK pode não expor execute cru — nesse caso os defaults ficam.
+        """
+        self._pragmas_applied = True
+
+        # Preferir um execute direto no KV, se o SDK oferecer
+        target = getattr(self._agentfs.kv, "execute", None)
+        if target is None:
+            for attr in ("db", "connection", "conn"):
+                conn = getattr(self._agentfs, attr, None) or getattr(
+                    self._agentfs.kv, attr, None
+                )
+                if conn is not None and hasattr(conn, "execute"):
+                    target = conn.execute
+                    break
+
+        if target is None:
+            logger.debug("KVStore sem execute cru; pragmas não aplicados")
+            return
+
+        for pragma in _SQLITE_TUNING_PRAGMAS:
+            try:
+                result = target(pragma)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.debug("Pragma ignorado (%s): %s", pragma, e)
+        logger.info("Pragmas de tuning aplicados ao KVStore de usuários")
+
+    # =========================================================================
+    # ÍNDICES SECUNDÁRIOS E CONTADORES
+    # =========================================================================
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[_KVTransaction]:
+        """Agrupa escritas no KVStore em um único flush ao sair do bloco.
+
+        Passar o objeto yielded como `kv=` para save_user/_index_add/
+        _incr_stat bufferiza as escritas em vez de pagar um round-trip
+        por chamada.
+        """
+        txn = _KVTransaction(self._agentfs.kv)
+        yield txn
+        await txn.flush()
+
+    def _key_lock(self, key: str) -> asyncio.Lock:
+        """Lock por chave para serializar mutações de índices/contadores."""
+        lock = self._mutation_locks.get(key)
+        if lock is None:
+            lock = self._mutation_locks[key] = asyncio.Lock()
+        return lock
+
+    async def _index_add(self, key: str, user_id: str, kv: Any = None) -> None:
+        """Adiciona user_id a um índice (lista de ids no KVStore)."""
+        kv = kv or self._agentfs.kv
+        async with self._key_lock(key):
+            try:
+                if key in self._mutated_values:
+                    ids = self._mutated_values[key]
+                else:
+                    ids = await kv.get(key) or []
+                if user_id not in ids:
+                    ids.append(user_id)
+                    self._mutated_values[key] = ids
+                    await kv.set(key, ids)
+            except Exception as e:
+                logger.error("Erro ao atualizar índice %s: %s", key, e)
+
+    async def _index_remove(self, key: str, user_id: str, kv: Any = None) -> None:
+        """Remove user_id de um índice, se presente."""
+        kv = kv or self._agentfs.kv
+        async with self._key_lock(key):
+            try:
+                if key in self._mutated_values:
+                    ids = self._mutated_values[key]
+                else:
+                    ids = await kv.get(key) or []
+                if user_id in ids:
+                    ids.remove(user_id)
+                    self._mutated_values[key] = ids
+                    await kv.set(key, ids)
+            except Exception as e:
+                logger.error("Erro ao atualizar índice %s: %s", key, e)
+
+    async def _incr_stat(self, key: str, delta: int = 1, kv: Any = None) -> None:
+        """Incrementa um contador agregado."""
+        kv = kv or self._agentfs.kv
+        async with self._key_lock(key):
+            try:
+                if key in self._mutated_values:
+                    current = self._mutated_values[key]
+                else:
+                    current = await kv.get(key) or 0
+                self._mutated_values[key] = current + delta
+                await kv.set(key, current + delta)
+            except Exception as e:
+                logger.error("Erro ao incrementar %s: %s", key, e)
+
+    async def _ensure_indexes(self) -> None:
+        """Backfill único de índices/contadores para dados pré-índice.
+
+        Perfis gravados antes dos índices secundários não aparecem em
+        idx:*/stats:* — sem isto, deployments existentes veriam grupos
+        vazios e stats zeradas. Na primeira query este scan (o caminho
+        O(N) que os índices substituíram) reconstrói tudo a partir dos
+        perfis e grava um marcador para nunca repetir.
+        """
+        if self._indexes_ready:
+            return
+        async with self._backfill_lock:
+            if self._indexes_ready:
+                return
+            try:
+                if await self._agentfs.kv.get(KEY_IDX_BACKFILLED):
+                    self._indexes_ready = True
+                    return
+
+                items = await self._agentfs.kv.list(KEY_PREFIX_USER)
+                group_members: dict[str, list[str]] = {}
+                unwelcomed: dict[str, list[str]] = {}
+                active_days: dict[str, list[str]] = {}
+                total = welcomed = engaged = messages = 0
+                for item in items:
+                    try:
+                        user = _parse_profile(item["value"])
+                    except Exception as e:
+                        logger.error("Perfil ignorado no backfill: %s", e)
+                        continue
+                    total += 1
+                    messages += user.total_messages_sent
+                    if user.welcomed_groups or user.status != UserStatus.NEW:
+                        welcomed += 1
+                    if user.status == UserStatus.ENGAGED:
+                        engaged += 1
+                    for group_id in user.group_ids:
+                        group_members.setdefault(group_id, []).append(user.user_id)
+                        if group_id not in user.welcomed_groups:
+                            unwelcomed.setdefault(group_id, []).append(user.user_id)
+                    if user.last_interaction_at:
+                        day = user.last_interaction_at.strftime("%Y-%m-%d")
+                        active_days.setdefault(day, []).append(user.user_id)
+
+                seeded: dict[str, Any] = {KEY_IDX_BACKFILLED: True}
+                for group_id, ids in group_members.items():
+                    seeded[f"{KEY_PREFIX_IDX_GROUP}{group_id}"] = ids
+                for group_id, ids in unwelcomed.items():
+                    seeded[f"{KEY_PREFIX_IDX_UNWELCOMED}{group_id}"] = ids
+                for day, ids in active_days.items():
+                    seeded[f"{KEY_PREFIX_IDX_ACTIVE_DAY}{day}"] = ids
+                seeded[KEY_STAT_TOTAL_USERS] = total
+                seeded[KEY_STAT_TOTAL_MESSAGES] = messages
+                seeded[KEY_STAT_WELCOMED] = welcomed
+                seeded[KEY_STAT_ENGAGED] = engaged
+                async with self.transaction() as txn:
+                    for key, value in seeded.items():
+                        # Chaves já mutadas neste processo são mais novas
+                        # que o scan: não regredir
+                        if key not in self._mutated_values:
+                            await txn.set(key, value)
+
+                self._indexes_ready = True
+                logger.info(
+                    "Índices backfilled: %s usuários, %s grupos", total, len(group_members)
+                )
+            except Exception as e:
+                logger.error("Erro no backfill de índices: %s", e)
+
+    async def _load_profiles(self, user_ids: list[str]) -> list[UserProfile]:
+        """Carrega perfis em paralelo (cache primeiro, depois KVStore).
+
+        Args:
+            user_ids: IDs dos usuários a carregar
+
+        Returns:
+            Perfis encontrados (ids sem perfil são ignorados)
+        """
+        cached = []
+        missing = []
+        for uid in user_ids:
+            user = self._cache_get(uid)
+            if user is not None:
+                cached.append(user)
+            else:
+                missing.append(uid)
+        if not missing:
+            return cached
+
+        results = await asyncio.gather(
+            *(self._agentfs.kv.get(self._get_user_key(uid)) for uid in missing),
+            return_exceptions=True,
+        )
+        rows: list[dict] = []
+        for uid, data in zip(missing, results):
+            if isinstance(data, Exception):
+                logger.error("Erro ao carregar usuário %s: %s", uid, data)
+            elif data:
+                rows.append(data)
+
+        if len(rows) >= PARSE_OFFLOAD_MIN:
+            # Lote grande (query de admin): parsear em worker threads para
+            # não segurar o event loop enquanto webhooks chegam
+            chunks = [
+                rows[i : i + PARSE_CHUNK_SIZE]
+                for i in range(0, len(rows), PARSE_CHUNK_SIZE)
+            ]
+            parsed_chunks = await asyncio.gather(
+                *(asyncio.to_thread(_parse_profile_chunk, chunk) for chunk in chunks)
+            )
+            parsed = [user for chunk in parsed_chunks for user in chunk]
+        else:
+            parsed = _parse_profile_chunk(rows)
+
+        for user in parsed:
+            if user is not None:
+                self._cache_put(user)
+                cached.append(user)
+        return cached
+
     # =========================================================================
     # USER PROFILE MANAGEMENT
     # =========================================================================
@@ -48,6 +495,11 @@ class UserManagerKV:
     async def get_user(self, user_id: str, display_name: str = "") -> UserProfile:
         """Busca ou cria perfil de usuário.
 
+        Cache misses simultâneos para o mesmo usuário (rajada de
+        webhooks) compartilham uma única leitura do KV (single-flight):
+        todos recebem o MESMO objeto, então mutações concorrentes de
+        contadores não se perdem entre cópias.
+
         Args:
             user_id: ID do usuário (número@s.whatsapp.net)
             display_name: Nome do usuário no WhatsApp
@@ -55,31 +507,50 @@ class UserManagerKV:
         Returns:
             Perfil do usuário
         """
+        if not self._pragmas_applied:
+            await self.configure_pragmas()
+
         # Verificar cache primeiro
-        if user_id in self._cache:
-            user = self._cache[user_id]
-            # Atualizar nome se fornecido e diferente
-            if display_name and display_name != user.display_name:
-                user.display_name = display_name
-                await self.save_user(user)
-            return user
+        user = self._cache_get(user_id)
+        if user is None:
+            inflight = self._inflight.get(user_id)
+            if inflight is not None:
+                user = await inflight
+            else:
+                future: asyncio.Future[UserProfile] = (
+                    asyncio.get_running_loop().create_future()
+                )
+                self._inflight[user_id] = future
+                try:
+                    user = await self._load_or_create(user_id, display_name)
+                    future.set_result(user)
+                except Exception as e:
+                    future.set_exception(e)
+                    # Marca a exceção como consumida (pode não haver
+                    # outro coroutine aguardando este future)
+                    future.exception()
+                    raise
+                finally:
+                    self._inflight.pop(user_id, None)
+
+        # Atualizar nome se fornecido e diferente
+        if display_name and display_name != user.display_name:
+            user.display_name = display_name
+            await self.save_user(user)
+        return user
 
-        # Tentar carregar do KVStore
+    async def _load_or_create(self, user_id: str, display_name: str) -> UserProfile:
+        """Carrega o perfil do KVStore ou cria um novo."""
         key = self._get_user_key(user_id)
         try:
             data = await self._agentfs.kv.get(key)
             if data:
-                user = UserProfile.model_validate(data)
-                self._cache[user_id] = user
-                logger.debug(f"Usuário carregado do KVStore: {user_id}")
-
-                # Atualizar nome se fornecido e diferente
-                if display_name and display_name != user.display_name:
-                    user.display_name = display_name
-                    await self.save_user(user)
+                user = _parse_profile(data)
+                self._cache_put(user)
+                logger.debug("Usuário carregado do KVStore: %s", user_id)
                 return user
         except Exception as e:
-            logger.error(f"Erro ao carregar usuário {user_id}: {e}")
+            logger.error("Erro ao carregar usuário %s: %s", user_id, e)
 
         # Criar novo perfil
         phone_clean = user_id.split("@")[0]
@@ -88,24 +559,87 @@ class UserManagerKV:
             phone_number=phone_clean,
             display_name=display_name or phone_clean,
         )
-        self._cache[user_id] = user
         await self.save_user(user)
-        logger.info(f"Novo usuário criado: {user_id} ({display_name})")
+        await self._incr_stat(KEY_STAT_TOTAL_USERS)
+        logger.info("Novo usuário criado: %s (%s)", user_id, display_name)
         return user
 
-    async def save_user(self, user: UserProfile) -> None:
+    async def save_user(self, user: UserProfile, kv: Any = None) -> None:
         """Persiste perfil do usuário no KVStore.
 
         Args:
             user: Perfil a ser salvo
+            kv: Transação aberta via transaction() (opcional)
         """
+        kv = kv or self._agentfs.kv
         try:
-            self._cache[user.user_id] = user
+            self._cache_put(user)
+
+            # Um save explícito torna o adiado redundante (grava o
+            # perfil inteiro, incluindo as mudanças coalescidas)
+            handle = self._save_handles.pop(user.user_id, None)
+            if handle is not None:
+                handle.cancel()
+
+            # Serialização em uma passada no pydantic-core; se nada mudou
+            # desde o último save, não há por que pagar o round-trip
+            payload = user.model_dump_json()
+            if self._last_saved.get(user.user_id) == payload:
+                return
+
             key = self._get_user_key(user.user_id)
-            await self._agentfs.kv.set(key, user.model_dump(mode="json"))
-            logger.debug(f"Usuário salvo no KVStore: {user.user_id}")
+            record = _loads(payload)
+            record["_v"] = SCHEMA_VERSION
+            await kv.set(key, record)
+            self._last_saved[user.user_id] = payload
+            logger.debug("Usuário salvo no KVStore: %s", user.user_id)
         except Exception as e:
-            logger.error(f"Erro ao salvar usuário {user.user_id}: {e}")
+            logger.error("Erro ao salvar usuário %s: %s", user.user_id, e)
+
+    def _schedule_save(self, user: UserProfile) -> None:
+        """Agenda um save debounced do perfil (coalesce de rajadas).
+
+        Mudanças de baixo risco (last_interaction_at, contadores de
+        mensagem) não justificam um round-trip por evento: o cache já
+        tem a versão corrente e o flush grava só o estado final.
+        """
+        self._cache_put(user)
+        handle = self._save_handles.pop(user.user_id, None)
+        if handle is not None:
+            handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._save_handles[user.user_id] = loop.call_later(
+            SAVE_DEBOUNCE_SECONDS,
+            lambda: asyncio.ensure_future(self._flush_user(user.user_id)),
+        )
+
+    async def _flush_user(self, user_id: str) -> None:
+        """Grava o perfil adiado e os deltas de contadores acumulados."""
+        self._save_handles.pop(user_id, None)
+        user = self._cache.get(user_id)
+        deltas, self._stat_deltas = self._stat_deltas, {}
+        try:
+            async with self.transaction() as txn:
+                if user is not None:
+                    await self.save_user(user, kv=txn)
+                for key, delta in deltas.items():
+                    if delta:
+                        await self._incr_stat(key, delta, kv=txn)
+        except Exception as e:
+            logger.error("Erro no flush adiado de %s: %s", user_id, e)
+
+    async def _resolve_user(self, user: str | UserProfile) -> UserProfile:
+        """Aceita user_id ou perfil já carregado (evita re-buscar).
+
+        Args:
+            user: ID do usuário ou o próprio UserProfile
+
+        Returns:
+            Perfil do usuário
+        """
+        if isinstance(user, UserProfile):
+            return user
+        return await self.get_user(user)
 
     async def user_joined_group(
         self,
@@ -125,74 +659,151 @@ class UserManagerKV:
         Returns:
             Tuple (perfil do usuário, se é novo no grupo)
         """
+        # Índices semeados antes do primeiro append (dados pré-índice)
+        await self._ensure_indexes()
         user = await self.get_user(user_id, user_name)
-        is_new = group_id not in user.groups
+        is_new = group_id not in user.group_ids
 
         user.add_to_group(group_id, group_name)
-        await self.save_user(user)
+
+        # Perfil + índices do grupo em um único flush no KVStore
+        async with self.transaction() as txn:
+            await self.save_user(user, kv=txn)
+            if is_new:
+                await self._index_add(f"{KEY_PREFIX_IDX_GROUP}{group_id}", user_id, kv=txn)
+                await self._index_add(
+                    f"{KEY_PREFIX_IDX_UNWELCOMED}{group_id}", user_id, kv=txn
+                )
 
         if is_new:
-            logger.info(f"Usuário {user_name} entrou no grupo {group_name}")
+            logger.info("Usuário %s entrou no grupo %s", user_name, group_name)
 
         return user, is_new
 
-    async def mark_user_welcomed(self, user_id: str, group_id: str) -> None:
+    async def mark_user_welcomed(self, user: str | UserProfile, group_id: str) -> None:
         """Marca que usuário recebeu DM de boas-vindas para um grupo.
 
         Args:
-            user_id: ID do usuário
+            user: ID do usuário ou perfil já carregado
             group_id: ID do grupo
         """
-        user = await self.get_user(user_id)
+        user = await self._resolve_user(user)
+        was_new = user.status == UserStatus.NEW
         user.mark_welcomed(group_id)
-        await self.save_user(user)
-        logger.info(f"Usuário {user.display_name} welcomed para grupo {group_id}")
-
-    async def should_send_welcome(self, user_id: str, group_id: str) -> bool:
+        self._welcomed_pairs.add(f"{user.user_id}:{group_id}")
+
+        async with self.transaction() as txn:
+            await self.save_user(user, kv=txn)
+            await self._index_remove(
+                f"{KEY_PREFIX_IDX_UNWELCOMED}{group_id}", user.user_id, kv=txn
+            )
+            if was_new:
+                await self._incr_stat(KEY_STAT_WELCOMED, kv=txn)
+        logger.info("Usuário %s welcomed para grupo %s", user.display_name, group_id)
+
+    async def should_send_welcome(self, user: str | UserProfile, group_id: str) -> bool:
         """Verifica se deve enviar DM de boas-vindas.
 
         Args:
-            user_id: ID do usuário
+            user: ID do usuário ou perfil já carregado
             group_id: ID do grupo
 
         Returns:
             True se deve enviar DM
         """
-        user = await self.get_user(user_id)
+        # Atalho exato em memória: welcomed conhecido → sem tocar o KV
+        if isinstance(user, str) and f"{user}:{group_id}" in self._welcomed_pairs:
+            return False
+        user = await self._resolve_user(user)
         return not user.was_welcomed_for_group(group_id)
 
     async def add_conversation_message(
         self,
-        user_id: str,
+        user: str | UserProfile,
         role: str,
         content: str,
     ) -> UserProfile:
         """Adiciona mensagem ao histórico de conversa.
 
         Args:
-            user_id: ID do usuário
+            user: ID do usuário ou perfil já carregado
             role: "user" ou "assistant"
             content: Conteúdo da mensagem
 
         Returns:
             Perfil atualizado
         """
-        user = await self.get_user(user_id)
-        user.add_message(role, content)
-        await self.save_user(user)
+        user = await self._resolve_user(user)
+        prev_status = user.status
+        # Um datetime.now() por evento, repassado aos timestamps tocados
+        now = datetime.now()
+        overflow = user.add_message(role, content, now=now)
+
+        # Contadores viram deltas em memória (drenados no flush); o
+        # índice diário só precisa de uma escrita por usuário por dia
+        self._stat_deltas[KEY_STAT_TOTAL_MESSAGES] = (
+            self._stat_deltas.get(KEY_STAT_TOTAL_MESSAGES, 0) + 1
+        )
+        day_pending: str | None = None
+        if role == "user":
+            today = now.strftime("%Y-%m-%d")
+            if today != self._active_day:
+                self._active_day = today
+                self._active_day_marked.clear()
+            if user.user_id not in self._active_day_marked:
+                self._active_day_marked.add(user.user_id)
+                day_pending = today
+            if user.status == UserStatus.ENGAGED and prev_status != UserStatus.ENGAGED:
+                self._stat_deltas[KEY_STAT_ENGAGED] = (
+                    self._stat_deltas.get(KEY_STAT_ENGAGED, 0) + 1
+                )
+                if prev_status == UserStatus.NEW:
+                    # Pulou direto de NEW para ENGAGED: conta como welcomed também
+                    self._stat_deltas[KEY_STAT_WELCOMED] = (
+                        self._stat_deltas.get(KEY_STAT_WELCOMED, 0) + 1
+                    )
+
+        if overflow or user.status != prev_status or day_pending is not None:
+            # Transições importantes (status, primeira atividade do dia,
+            # arquivamento) persistem na hora, drenando o que estava
+            # coalescido no mesmo flush
+            deltas, self._stat_deltas = self._stat_deltas, {}
+            async with self.transaction() as txn:
+                if overflow:
+                    # Mensagens antigas saem do perfil para um chunk append-only;
+                    # o payload do save_user fica de tamanho constante
+                    user.archived_chunks += 1
+                    chunk_key = f"{KEY_PREFIX_HISTORY}{user.user_id}:{user.archived_chunks}"
+                    await txn.set(
+                        chunk_key, [m.model_dump(mode="json") for m in overflow]
+                    )
+                await self.save_user(user, kv=txn)
+                if day_pending is not None:
+                    await self._index_add(
+                        f"{KEY_PREFIX_IDX_ACTIVE_DAY}{day_pending}", user.user_id, kv=txn
+                    )
+                for key, delta in deltas.items():
+                    if delta:
+                        await self._incr_stat(key, delta, kv=txn)
+        else:
+            # Caso comum (mensagem no meio de uma conversa): só marca o
+            # perfil como sujo e deixa o debounce gravar o estado final
+            self._schedule_save(user)
         return user
 
-    async def get_user_context(self, user_id: str, limit: int = 10) -> list[dict[str, str]]:
+    async def get_user_context(
+        self, user: str | UserProfile, limit: int = 10
+    ) -> list[dict[str, str]]:
         """Retorna contexto de conversa para LLM.
 
         Args:
-            user_id: ID do usuário
+            user: ID do usuário ou perfil já carregado
             limit: Máximo de mensagens
 
         Returns:
             Lista de mensagens para contexto
         """
-        user = await self.get_user(user_id)
+        user = await self._resolve_user(user)
         return user.get_context_for_llm(limit)
 
     # =========================================================================
@@ -208,9 +819,17 @@ class UserManagerKV:
         Returns:
             Configuração de boas-vindas
         """
-        # Verificar cache
-        if group_id in self._welcome_configs:
-            return self._welcome_configs[group_id]
+        if not self._pragmas_applied:
+            await self.configure_pragmas()
+
+        # Verificar cache (entradas frescas evitam o round-trip;
+        # expiradas revalidam no KV para enxergar mudanças de outro worker)
+        entry = self._welcome_configs.get(group_id)
+        if entry is not None:
+            cached_at, config = entry
+            if time.monotonic() - cached_at < WELCOME_CONFIG_TTL_SECONDS:
+                self._welcome_configs.move_to_end(group_id)
+                return config
 
         # Tentar carregar do KVStore
         key = self._get_welcome_config_key(group_id)
@@ -218,14 +837,16 @@ class UserManagerKV:
             data = await self._agentfs.kv.get(key)
             if data:
                 config = WelcomeConfig.model_validate(data)
-                self._welcome_configs[group_id] = config
+                self._config_cache_put(config)
                 return config
         except Exception as e:
-            logger.error(f"Erro ao carregar welcome config {group_id}: {e}")
+            logger.error("Erro ao carregar welcome config %s: %s", group_id, e)
+            if entry is not None:
+                # KV fora do ar: melhor servir a config expirada que falhar
+                return entry[1]
 
         # Criar config padrão
         config = WelcomeConfig(group_id=group_id)
-        self._welcome_configs[group_id] = config
         await self.save_welcome_config(config)
         return config
 
@@ -236,12 +857,12 @@ class UserManagerKV:
             config: Configuração a salvar
         """
         try:
-            self._welcome_configs[config.group_id] = config
+            self._config_cache_put(config)
             key = self._get_welcome_config_key(config.group_id)
             await self._agentfs.kv.set(key, config.model_dump(mode="json"))
-            logger.debug(f"Welcome config salva: {config.group_id}")
+            logger.debug("Welcome config salva: %s", config.group_id)
         except Exception as e:
-            logger.error(f"Erro ao salvar welcome config {config.group_id}: {e}")
+            logger.error("Erro ao salvar welcome config %s: %s", config.group_id, e)
 
     async def update_welcome_message(
         self,
@@ -294,19 +915,78 @@ class UserManagerKV:
         Returns:
             Lista de perfis de usuários
         """
-        users = []
         try:
-            items = await self._agentfs.kv.list(KEY_PREFIX_USER)
-            for item in items:
-                try:
-                    user = UserProfile.model_validate(item["value"])
-                    if group_id in user.groups:
-                        users.append(user)
-                except Exception as e:
-                    logger.error(f"Erro ao parsear usuário: {e}")
+            await self._ensure_indexes()
+            user_ids = await self._agentfs.kv.get(f"{KEY_PREFIX_IDX_GROUP}{group_id}") or []
+            return await self._load_profiles(user_ids)
+        except Exception as e:
+            logger.error("Erro ao listar usuários do grupo %s: %s", group_id, e)
+            return []
+
+    async def list_group_user_summaries(self, group_id: str) -> list[dict]:
+        """Projeção leve dos usuários de um grupo (sem montar UserProfile).
+
+        O endpoint de listagem devolve meia dúzia de campos; hidratar o
+        perfil inteiro pagaria o parse do histórico de conversa de cada
+        usuário. Aqui os dicts crus do KV são projetados direto, usando
+        o perfil em cache quando ele é mais recente que o KV.
+
+        Args:
+            group_id: ID do grupo
+
+        Returns:
+            Lista de dicts com os campos do resumo
+        """
+        try:
+            await self._ensure_indexes()
+            user_ids = (
+                await self._agentfs.kv.get(f"{KEY_PREFIX_IDX_GROUP}{group_id}") or []
+            )
+            summaries: list[dict] = []
+            missing: list[str] = []
+            for uid in user_ids:
+                # .get direto: listagem de admin não deve renovar o LRU
+                user = self._cache.get(uid)
+                if user is not None:
+                    summaries.append(
+                        {
+                            "user_id": user.user_id,
+                            "display_name": user.display_name,
+                            "status": user.status.value,
+                            "welcomed": group_id in user.welcomed_groups,
+                            "total_messages": user.total_messages_sent,
+                        }
+                    )
+                else:
+                    missing.append(uid)
+
+            results = await asyncio.gather(
+                *(self._agentfs.kv.get(self._get_user_key(uid)) for uid in missing),
+                return_exceptions=True,
+            )
+            for uid, data in zip(missing, results):
+                if isinstance(data, Exception) or not data:
+                    continue
+                welcomed_groups = data.get("welcomed_groups")
+                if welcomed_groups is None:
+                    # Layout antigo: groups é um dict de memberships
+                    membership = (data.get("groups") or {}).get(group_id) or {}
+                    welcomed = bool(membership.get("welcomed"))
+                else:
+                    welcomed = group_id in welcomed_groups
+                summaries.append(
+                    {
+                        "user_id": data.get("user_id", uid),
+                        "display_name": data.get("display_name", ""),
+                        "status": data.get("status", "new"),
+                        "welcomed": welcomed,
+                        "total_messages": data.get("total_messages_sent", 0),
+                    }
+                )
+            return summaries
         except Exception as e:
-            logger.error(f"Erro ao listar usuários do grupo {group_id}: {e}")
-        return users
+            logger.error("Erro ao resumir usuários do grupo %s: %s", group_id, e)
+            return []
 
     async def get_active_users(self, days: int = 7) -> list[UserProfile]:
         """Lista usuários ativos nos últimos N dias.
@@ -317,24 +997,39 @@ class UserManagerKV:
         Returns:
             Lista de usuários ativos
         """
-        from datetime import timedelta
-
-        cutoff = datetime.now() - timedelta(days=days)
-        users = []
+        now = datetime.now()
+        cutoff = now - timedelta(days=days)
 
         try:
-            items = await self._agentfs.kv.list(KEY_PREFIX_USER)
-            for item in items:
-                try:
-                    user = UserProfile.model_validate(item["value"])
-                    if user.last_interaction_at and user.last_interaction_at > cutoff:
-                        users.append(user)
-                except Exception as e:
-                    logger.error(f"Erro ao parsear usuário: {e}")
+            await self._ensure_indexes()
+            # União dos índices diários do período, depois filtro fino
+            # por last_interaction_at (o índice tem granularidade de dia)
+            day_keys = [
+                f"{KEY_PREFIX_IDX_ACTIVE_DAY}{(now - timedelta(days=d)).strftime('%Y-%m-%d')}"
+                for d in range(days + 1)
+            ]
+            results = await asyncio.gather(
+                *(self._agentfs.kv.get(key) for key in day_keys),
+                return_exceptions=True,
+            )
+            user_ids: list[str] = []
+            seen: set[str] = set()
+            for ids in results:
+                if isinstance(ids, Exception) or not ids:
+                    continue
+                for uid in ids:
+                    if uid not in seen:
+                        seen.add(uid)
+                        user_ids.append(uid)
+
+            users = await self._load_profiles(user_ids)
+            return [
+                u for u in users
+                if u.last_interaction_at and u.last_interaction_at > cutoff
+            ]
         except Exception as e:
-            logger.error(f"Erro ao listar usuários ativos: {e}")
-
-        return users
+            logger.error("Erro ao listar usuários ativos: %s", e)
+            return []
 
     async def get_unwelcomed_users(self, group_id: str) -> list[UserProfile]:
         """Lista usuários que ainda não receberam welcome de um grupo.
@@ -345,8 +1040,16 @@ class UserManagerKV:
         Returns:
             Lista de usuários não welcomed
         """
-        users = await self.get_users_in_group(group_id)
-        return [u for u in users if not u.was_welcomed_for_group(group_id)]
+        try:
+            await self._ensure_indexes()
+            key = f"{KEY_PREFIX_IDX_UNWELCOMED}{group_id}"
+            user_ids = await self._agentfs.kv.get(key) or []
+            users = await self._load_profiles(user_ids)
+            # O índice pode atrasar em relação ao perfil; revalidar o flag
+            return [u for u in users if not u.was_welcomed_for_group(group_id)]
+        except Exception as e:
+            logger.error("Erro ao listar não welcomed do grupo %s: %s", group_id, e)
+            return []
 
     async def get_stats(self) -> dict:
         """Retorna estatísticas gerais.
@@ -354,39 +1057,43 @@ class UserManagerKV:
         Returns:
             Dict com estatísticas
         """
-        total_users = 0
-        welcomed_users = 0
-        engaged_users = 0
-        total_messages = 0
-
         try:
-            items = await self._agentfs.kv.list(KEY_PREFIX_USER)
-            for item in items:
-                try:
-                    user = UserProfile.model_validate(item["value"])
-                    total_users += 1
-                    total_messages += user.total_messages_sent + user.total_messages_received
-
-                    if user.status != UserStatus.NEW:
-                        welcomed_users += 1
-                    if user.status in [UserStatus.ENGAGED, UserStatus.ACTIVE]:
-                        engaged_users += 1
-                except Exception:
-                    pass
+            await self._ensure_indexes()
+            totals = await asyncio.gather(
+                self._agentfs.kv.get(KEY_STAT_TOTAL_USERS),
+                self._agentfs.kv.get(KEY_STAT_WELCOMED),
+                self._agentfs.kv.get(KEY_STAT_ENGAGED),
+                self._agentfs.kv.get(KEY_STAT_TOTAL_MESSAGES),
+            )
         except Exception as e:
-            logger.error(f"Erro ao calcular stats: {e}")
+            logger.error("Erro ao calcular stats: %s", e)
+            totals = [0, 0, 0, 0]
 
         return {
-            "total_users": total_users,
-            "welcomed_users": welcomed_users,
-            "engaged_users": engaged_users,
-            "total_messages": total_messages,
+            "total_users": totals[0] or 0,
+            "welcomed_users": totals[1] or 0,
+            "engaged_users": totals[2] or 0,
+            "total_messages": totals[3] or 0,
         }
 
     def clear_cache(self) -> None:
-        """Limpa caches locais."""
+        """Limpa caches locais (saves adiados são despachados antes)."""
+        for user_id, handle in list(self._save_handles.items()):
+            handle.cancel()
+            user = self._cache.get(user_id)
+            if user is not None:
+                try:
+                    asyncio.get_running_loop().create_task(self.save_user(user))
+                except RuntimeError:
+                    logger.debug("Save adiado de %s descartado no clear_cache", user_id)
+        self._save_handles.clear()
         self._cache.clear()
         self._welcome_configs.clear()
+        self._last_saved.clear()
+        self._welcomed_pairs.clear()
+        self._active_day_marked.clear()
+        # Próxima mutação de índice/contador relê do KV
+        self._mutated_values.clear()
         logger.info("Cache de usuários limpo")
 
     async def delete_user(self, user_id: str) -> bool:
@@ -399,12 +1106,48 @@ class UserManagerKV:
             True se removido com sucesso
         """
         try:
+            # Carregar antes de apagar para limpar os índices dos grupos
+            user: UserProfile | None = self._cache.get(user_id)
+            if user is None:
+                try:
+                    data = await self._agentfs.kv.get(self._get_user_key(user_id))
+                    if data:
+                        user = _parse_profile(data)
+                except Exception:
+                    user = None
+
             key = self._get_user_key(user_id)
+            handle = self._save_handles.pop(user_id, None)
+            if handle is not None:
+                handle.cancel()
             await self._agentfs.kv.delete(key)
             if user_id in self._cache:
                 del self._cache[user_id]
-            logger.info(f"Usuário removido: {user_id}")
+            self._last_saved.pop(user_id, None)
+
+            if user is not None:
+                for group_id in user.welcomed_groups:
+                    self._welcomed_pairs.discard(f"{user_id}:{group_id}")
+                for group_id in user.group_ids:
+                    await self._index_remove(f"{KEY_PREFIX_IDX_GROUP}{group_id}", user_id)
+                    await self._index_remove(
+                        f"{KEY_PREFIX_IDX_UNWELCOMED}{group_id}", user_id
+                    )
+                for chunk_id in range(1, user.archived_chunks + 1):
+                    await self._agentfs.kv.delete(
+                        f"{KEY_PREFIX_HISTORY}{user_id}:{chunk_id}"
+                    )
+                await self._incr_stat(KEY_STAT_TOTAL_USERS, -1)
+                # Desfazer os contadores que o perfil incrementou em vida:
+                # welcomed conta quem saiu de NEW (via DM ou engajamento
+                # direto), engaged conta quem chegou a ENGAGED
+                if user.welcomed_groups or user.status != UserStatus.NEW:
+                    await self._incr_stat(KEY_STAT_WELCOMED, -1)
+                if user.status == UserStatus.ENGAGED:
+                    await self._incr_stat(KEY_STAT_ENGAGED, -1)
+
+            logger.info("Usuário removido: %s", user_id)
             return True
         except Exception as e:
-            logger.error(f"Erro ao remover usuário {user_id}: {e}")
+            logger.error("Erro ao remover usuário %s: %s", user_id, e)
             return False
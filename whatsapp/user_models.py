@@ -2,11 +2,34 @@
 
 from __future__ import annotations
 
+import re
 from datetime import datetime
 from enum import Enum
 from typing import Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+
+# Placeholders suportados na mensagem de boas-vindas
+_PLACEHOLDER_RE = re.compile(r"\{(name|group|phone)\}")
+
+
+def _now() -> datetime:
+    """Relógio dos modelos: indireção única para defaults e timestamps.
+
+    Handlers quentes chamam uma vez por evento e repassam via `now=`,
+    em vez de pagar datetime.now() em cada campo tocado.
+    """
+    return datetime.now()
+
+
+# Janela de histórico mantida dentro do perfil: só as últimas mensagens
+# interessam (get_context_for_llm usa ~10) e o perfil inteiro é
+# re-serializado a cada save, então a lista não pode crescer para sempre
+MAX_HISTORY = 50
+
+# Quando a janela estoura, as mais antigas saem em lote (uma escrita de
+# arquivo a cada N mensagens, em vez de uma por mensagem)
+HISTORY_ARCHIVE_BATCH = 25
 
 
 class UserStatus(str, Enum):
@@ -24,17 +47,7 @@ class ConversationMessage(BaseModel):
 
     role: str = Field(..., description="user ou assistant")
     content: str = Field(..., description="Conteúdo da mensagem")
-    timestamp: datetime = Field(default_factory=datetime.now)
-
-
-class GroupMembership(BaseModel):
-    """Informações de participação em grupo."""
-
-    group_id: str = Field(..., description="ID do grupo (@g.us)")
-    group_name: str = Field(default="", description="Nome do grupo")
-    joined_at: datetime = Field(default_factory=datetime.now)
-    welcomed: bool = Field(default=False, description="Se já recebeu DM de boas-vindas")
-    welcomed_at: datetime | None = Field(default=None)
+    timestamp: datetime = Field(default_factory=_now)
 
 
 class UserProfile(BaseModel):
@@ -46,20 +59,35 @@ class UserProfile(BaseModel):
     status: UserStatus = Field(default=UserStatus.NEW)
 
     # Timestamps
-    first_seen_at: datetime = Field(default_factory=datetime.now)
+    first_seen_at: datetime = Field(default_factory=_now)
     last_interaction_at: datetime | None = Field(default=None)
     last_dm_sent_at: datetime | None = Field(default=None)
 
-    # Grupos que participa
-    groups: dict[str, GroupMembership] = Field(
+    # Grupos que participa: sets para os checks quentes (membership e
+    # welcomed viram um `in` sem construir modelo nenhum), metadados de
+    # exibição ficam em dicts crus ao lado
+    group_ids: set[str] = Field(
+        default_factory=set,
+        description="IDs dos grupos que o usuário participa",
+    )
+    welcomed_groups: set[str] = Field(
+        default_factory=set,
+        description="Grupos para os quais já recebeu DM de boas-vindas",
+    )
+    group_meta: dict[str, dict] = Field(
         default_factory=dict,
-        description="Grupos que o usuário participa (group_id -> membership)",
+        description="Metadados por grupo (group_name, joined_at, welcomed_at)",
     )
 
-    # Histórico de conversa DM
+    # Histórico de conversa DM (janela recente; o resto vai para
+    # chunks user:history:<user_id>:<n> no KVStore)
     conversation_history: list[ConversationMessage] = Field(
         default_factory=list,
-        description="Histórico de mensagens no DM",
+        description="Histórico recente de mensagens no DM",
+    )
+    archived_chunks: int = Field(
+        default=0,
+        description="Quantos chunks de histórico antigo já foram arquivados",
     )
 
     # Metadados customizados
@@ -72,33 +100,59 @@ class UserProfile(BaseModel):
     total_messages_sent: int = Field(default=0, description="Mensagens enviadas pelo usuário")
     total_messages_received: int = Field(default=0, description="Mensagens que enviamos para ele")
 
-    def add_to_group(self, group_id: str, group_name: str = "") -> GroupMembership:
+    @model_validator(mode="before")
+    @classmethod
+    def _migrate_legacy_groups(cls, data: Any) -> Any:
+        """Converte o formato antigo (groups: dict de memberships)."""
+        if isinstance(data, dict) and "groups" in data and "group_ids" not in data:
+            groups = data.pop("groups") or {}
+            data["group_ids"] = list(groups)
+            data["welcomed_groups"] = [
+                gid
+                for gid, m in groups.items()
+                if isinstance(m, dict) and m.get("welcomed")
+            ]
+            data["group_meta"] = {
+                gid: {
+                    "group_name": m.get("group_name", ""),
+                    "joined_at": m.get("joined_at"),
+                    "welcomed_at": m.get("welcomed_at"),
+                }
+                for gid, m in groups.items()
+                if isinstance(m, dict)
+            }
+        return data
+
+    def add_to_group(
+        self, group_id: str, group_name: str = "", now: datetime | None = None
+    ) -> None:
         """Adiciona usuário a um grupo.
 
         Args:
             group_id: ID do grupo
             group_name: Nome do grupo
-
-        Returns:
-            Membership criado ou existente
+            now: Timestamp do evento (default: agora)
         """
-        if group_id not in self.groups:
-            self.groups[group_id] = GroupMembership(
-                group_id=group_id,
-                group_name=group_name,
-            )
-        return self.groups[group_id]
-
-    def mark_welcomed(self, group_id: str) -> None:
+        if group_id not in self.group_ids:
+            self.group_ids.add(group_id)
+            self.group_meta[group_id] = {
+                "group_name": group_name,
+                "joined_at": (now or _now()).isoformat(),
+                "welcomed_at": None,
+            }
+
+    def mark_welcomed(self, group_id: str, now: datetime | None = None) -> None:
         """Marca que usuário foi welcomed para um grupo específico.
 
         Args:
             group_id: ID do grupo
+            now: Timestamp do evento (default: agora)
         """
-        if group_id in self.groups:
-            self.groups[group_id].welcomed = True
-            self.groups[group_id].welcomed_at = datetime.now()
-            self.last_dm_sent_at = datetime.now()
+        if group_id in self.group_ids:
+            now = now or _now()
+            self.welcomed_groups.add(group_id)
+            self.group_meta.setdefault(group_id, {})["welcomed_at"] = now.isoformat()
+            self.last_dm_sent_at = now
             self.total_messages_received += 1
 
         if self.status == UserStatus.NEW:
@@ -113,30 +167,43 @@ class UserProfile(BaseModel):
         Returns:
             True se já recebeu DM de boas-vindas para este grupo
         """
-        if group_id not in self.groups:
-            return False
-        return self.groups[group_id].welcomed
+        return group_id in self.welcomed_groups
 
-    def add_message(self, role: str, content: str) -> None:
-        """Adiciona mensagem ao histórico.
+    def add_message(
+        self, role: str, content: str, now: datetime | None = None
+    ) -> list[ConversationMessage]:
+        """Adiciona mensagem ao histórico, mantendo a janela limitada.
 
         Args:
             role: "user" ou "assistant"
             content: Conteúdo da mensagem
+            now: Timestamp do evento (default: agora)
+
+        Returns:
+            Mensagens antigas que saíram da janela (para arquivar no KV)
         """
+        now = now or _now()
         self.conversation_history.append(
-            ConversationMessage(role=role, content=content)
+            ConversationMessage(role=role, content=content, timestamp=now)
         )
 
+        # Janela estourou: destacar o lote mais antigo para arquivamento
+        overflow: list[ConversationMessage] = []
+        if len(self.conversation_history) > MAX_HISTORY:
+            overflow = self.conversation_history[:HISTORY_ARCHIVE_BATCH]
+            self.conversation_history = self.conversation_history[HISTORY_ARCHIVE_BATCH:]
+
         # Atualizar contadores e timestamps
         if role == "user":
             self.total_messages_sent += 1
-            self.last_interaction_at = datetime.now()
+            self.last_interaction_at = now
             if self.status in [UserStatus.NEW, UserStatus.WELCOMED]:
                 self.status = UserStatus.ENGAGED
         else:
             self.total_messages_received += 1
-            self.last_dm_sent_at = datetime.now()
+            self.last_dm_sent_at = now
+
+        return overflow
 
     def get_recent_history(self, limit: int = 10) -> list[ConversationMessage]:
         """Retorna histórico recente de conversa.
@@ -171,7 +238,7 @@ class UserProfile(BaseModel):
     @property
     def group_count(self) -> int:
         """Número de grupos que participa."""
-        return len(self.groups)
+        return len(self.group_ids)
 
 
 class WelcomeConfig(BaseModel):
@@ -197,6 +264,10 @@ class WelcomeConfig(BaseModel):
         description="Se deve usar IA para responder mensagens subsequentes",
     )
 
+    # Template fatiado em literais e placeholders, memoizado por mensagem
+    # (três .replace() varriam a string inteira três vezes por DM)
+    _template_cache: tuple[str, list[str]] | None = PrivateAttr(default=None)
+
     def format_welcome(self, name: str, phone: str = "") -> str:
         """Formata mensagem de boas-vindas.
 
@@ -207,9 +278,14 @@ class WelcomeConfig(BaseModel):
         Returns:
             Mensagem formatada
         """
-        return (
-            self.welcome_message
-            .replace("{name}", name)
-            .replace("{group}", self.group_name)
-            .replace("{phone}", phone)
+        cached = self._template_cache
+        if cached is None or cached[0] is not self.welcome_message:
+            # re.split com grupo de captura: índices ímpares são os
+            # nomes dos placeholders, pares são literais
+            cached = (self.welcome_message, _PLACEHOLDER_RE.split(self.welcome_message))
+            self._template_cache = cached
+
+        subs = {"name": name, "group": self.group_name, "phone": phone}
+        return "".join(
+            subs[part] if i % 2 else part for i, part in enumerate(cached[1])
         )
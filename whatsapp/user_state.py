@@ -4,17 +4,55 @@ from __future__ import annotations
 
 import json
 import logging
+import sqlite3
+import threading
+import time
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    # orjson não instalado - cai no json stdlib
+    orjson = None
+
 from .models import QuizFlowState, UserQuizState
 
 logger = logging.getLogger(__name__)
 
+# Decode de bytes JSON: orjson quando disponível (C), stdlib caso contrário
+_loads = orjson.loads if orjson is not None else json.loads
+
+# Estados com quiz ativo (filtrados direto no SQL via índice)
+_ACTIVE_STATES = (QuizFlowState.IN_QUIZ.value, QuizFlowState.IN_CHAT.value)
+
+# Janela de coalescência do writer: updates em rajada para o mesmo
+# usuário viram uma única linha gravada, com um commit por lote
+FLUSH_INTERVAL_SECONDS = 0.1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_states (
+    user_id TEXT PRIMARY KEY,
+    flow_state TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_user_states_flow ON user_states(flow_state);
+"""
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
 
 class UserStateManager:
     """Gerencia estado de quiz por usuário WhatsApp.
 
-    Persiste estado em arquivo JSON para sobreviver a reinicializações.
+    Persiste estados em um único SQLite (WAL) para sobreviver a
+    reinicializações. Um arquivo por usuário exigia um glob + read +
+    parse por perfil a cada query de ativos; com a tabela indexada por
+    flow_state a busca vira um SELECT.
     """
 
     def __init__(self, storage_path: str = ".whatsapp_states"):
@@ -25,17 +63,89 @@ class UserStateManager:
         """
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(exist_ok=True)
+        self._db = sqlite3.connect(
+            self.storage_path / "states.db", check_same_thread=False
+        )
+        for pragma in _PRAGMAS:
+            try:
+                self._db.execute(pragma)
+            except sqlite3.Error as e:
+                logger.debug(f"Pragma ignorado ({pragma}): {e}")
+        self._db.executescript(_SCHEMA)
         self._cache: dict[str, UserQuizState] = {}
+        # Último JSON gravado por usuário: permite pular writes redundantes
+        self._last_written: dict[str, str] = {}
+        # Writes vão para um buffer drenado por uma thread dedicada:
+        # save_state não bloqueia o event loop em disco/fsync
+        self._pending: dict[str, tuple[str, str]] = {}
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._migrate_legacy_files()
+        self._writer = threading.Thread(
+            target=self._writer_loop, daemon=True, name="user-state-writer"
+        )
+        self._writer.start()
         logger.info(f"UserStateManager inicializado: {self.storage_path}")
 
-    def _get_user_file(self, user_id: str) -> Path:
-        """Retorna caminho do arquivo de estado do usuário."""
-        # Sanitizar user_id para nome de arquivo válido
-        safe_id = user_id.replace("+", "").replace("@", "_at_")
-        return self.storage_path / f"{safe_id}.json"
+    def _migrate_legacy_files(self) -> None:
+        """Importa estados do formato antigo (um .json por usuário)."""
+        migrated = 0
+        for user_file in self.storage_path.glob("*.json"):
+            try:
+                data = _loads(user_file.read_bytes())
+                state = UserQuizState.model_validate(data)
+                self._write_row(state)
+                user_file.unlink()
+                migrated += 1
+            except Exception as e:
+                logger.error(f"Erro ao migrar {user_file}: {e}")
+        if migrated:
+            logger.info(f"{migrated} estados migrados para SQLite")
+
+    def _write_row(self, state: UserQuizState) -> str:
+        """Grava o estado na tabela e retorna o JSON serializado."""
+        payload = state.model_dump_json()
+        flow = getattr(state.flow_state, "value", state.flow_state)
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO user_states (user_id, flow_state, payload) "
+                "VALUES (?, ?, ?)",
+                (state.user_id, flow, payload),
+            )
+            self._db.commit()
+        return payload
+
+    def _writer_loop(self) -> None:
+        """Drena o buffer de escritas em lotes coalescidos."""
+        while True:
+            self._wake.wait()
+            # Pequena janela para juntar updates em rajada num commit só
+            time.sleep(FLUSH_INTERVAL_SECONDS)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        """Grava imediatamente todas as escritas pendentes."""
+        with self._pending_lock:
+            if not self._pending:
+                return
+            batch = list(self._pending.items())
+            self._pending.clear()
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO user_states (user_id, flow_state, payload) "
+                    "VALUES (?, ?, ?)",
+                    [(uid, flow, payload) for uid, (flow, payload) in batch],
+                )
+                self._db.commit()
+            logger.debug(f"{len(batch)} estados gravados em lote")
+        except Exception as e:
+            logger.error(f"Erro ao gravar lote de estados: {e}")
 
     def get_state(self, user_id: str) -> UserQuizState:
-        """Busca estado do usuário (cache ou disco).
+        """Busca estado do usuário (cache ou banco).
 
         Args:
             user_id: ID do usuário no WhatsApp
@@ -47,17 +157,21 @@ class UserStateManager:
         if user_id in self._cache:
             return self._cache[user_id]
 
-        # Tentar carregar do disco
-        user_file = self._get_user_file(user_id)
-        if user_file.exists():
-            try:
-                data = json.loads(user_file.read_text())
-                state = UserQuizState(**data)
+        # Tentar carregar do banco
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT payload FROM user_states WHERE user_id = ?", (user_id,)
+                ).fetchone()
+            if row:
+                # Decode tipado direto no pydantic-core (sem dict
+                # intermediário de json.loads)
+                state = UserQuizState.model_validate_json(row[0])
                 self._cache[user_id] = state
-                logger.debug(f"Estado carregado do disco: {user_id}")
+                logger.debug(f"Estado carregado do banco: {user_id}")
                 return state
-            except Exception as e:
-                logger.error(f"Erro ao carregar estado de {user_id}: {e}")
+        except Exception as e:
+            logger.error(f"Erro ao carregar estado de {user_id}: {e}")
 
         # Criar novo estado
         state = UserQuizState(user_id=user_id)
@@ -76,13 +190,39 @@ class UserStateManager:
             # Atualizar cache
             self._cache[state.user_id] = state
 
-            # Salvar em disco
-            user_file = self._get_user_file(state.user_id)
-            user_file.write_text(state.model_dump_json(indent=2))
-            logger.debug(f"Estado salvo: {state.user_id}")
+            # Serialização compacta; se nada mudou desde o último save,
+            # não há por que reescrever a linha
+            payload = state.model_dump_json()
+            if self._last_written.get(state.user_id) == payload:
+                return
+
+            # Só a versão mais recente de cada usuário fica pendente;
+            # a thread de escrita grava o lote fora do event loop
+            flow = getattr(state.flow_state, "value", state.flow_state)
+            with self._pending_lock:
+                self._pending[state.user_id] = (flow, payload)
+            self._last_written[state.user_id] = payload
+            self._wake.set()
+            logger.debug(f"Estado enfileirado para save: {state.user_id}")
         except Exception as e:
             logger.error(f"Erro ao salvar estado de {state.user_id}: {e}")
 
+    def new_state(self, user_id: str) -> UserQuizState:
+        """Cria estado zerado apenas em memória (sem write no banco).
+
+        Para fluxos que vão mutar e salvar o estado logo em seguida
+        (ex: reiniciar quiz), evitando um write intermediário.
+
+        Args:
+            user_id: ID do usuário
+
+        Returns:
+            Estado novo já registrado no cache
+        """
+        state = UserQuizState(user_id=user_id)
+        self._cache[user_id] = state
+        return state
+
     def reset_user(self, user_id: str) -> None:
         """Reseta estado do usuário (novo quiz).
 
@@ -100,17 +240,64 @@ class UserStateManager:
             Lista de estados de usuários em quiz
         """
         active = []
-        for user_file in self.storage_path.glob("*.json"):
-            try:
-                data = json.loads(user_file.read_text())
-                state = UserQuizState(**data)
-                if state.flow_state in [QuizFlowState.IN_QUIZ, QuizFlowState.IN_CHAT]:
-                    active.append(state)
-            except Exception as e:
-                logger.error(f"Erro ao ler {user_file}: {e}")
+        try:
+            self.flush()
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT payload FROM user_states WHERE flow_state IN (?, ?)",
+                    _ACTIVE_STATES,
+                ).fetchall()
+            for (payload,) in rows:
+                try:
+                    active.append(UserQuizState.model_validate_json(payload))
+                except Exception as e:
+                    logger.error(f"Erro ao parsear estado: {e}")
+        except Exception as e:
+            logger.error(f"Erro ao listar usuários ativos: {e}")
         return active
 
+    def list_active_projections(
+        self,
+        fields: tuple[str, ...] = (
+            "user_id",
+            "quiz_id",
+            "current_question",
+            "score",
+            "flow_state",
+        ),
+    ) -> list[dict]:
+        """Lista usuários ativos já projetados nos campos pedidos.
+
+        Pula a construção/validação de UserQuizState: lê o JSON cru e
+        seleciona só os campos que o endpoint vai devolver.
+
+        Args:
+            fields: Campos a incluir em cada dict
+
+        Returns:
+            Lista de dicts prontos para resposta JSON
+        """
+        users = []
+        try:
+            self.flush()
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT payload FROM user_states WHERE flow_state IN (?, ?)",
+                    _ACTIVE_STATES,
+                ).fetchall()
+            for (payload,) in rows:
+                try:
+                    data = _loads(payload)
+                    users.append({field: data.get(field) for field in fields})
+                except Exception as e:
+                    logger.error(f"Erro ao parsear estado: {e}")
+        except Exception as e:
+            logger.error(f"Erro ao listar usuários ativos: {e}")
+        return users
+
     def clear_cache(self) -> None:
-        """Limpa cache de estados (forçar reload do disco)."""
+        """Limpa cache de estados (forçar reload do banco)."""
+        self.flush()
         self._cache.clear()
+        self._last_written.clear()
         logger.info("Cache de estados limpo")
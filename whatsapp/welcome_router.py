@@ -12,12 +12,24 @@ Separado do group_router.py que cuida do Quiz.
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import hmac
+import json
 import logging
 import os
+import re
+import time
+from datetime import datetime
 from typing import TYPE_CHECKING
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
-from pydantic import BaseModel
+try:
+    import orjson
+except ImportError:
+    # orjson não instalado - cai no parser stdlib
+    orjson = None
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, ConfigDict
 
 import app_state
 from .evolution_client import EvolutionAPIClient, get_evolution_client
@@ -29,8 +41,147 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# Decode do corpo do webhook: orjson quando disponível (C)
+_loads = orjson.loads if orjson is not None else json.loads
+
 router = APIRouter(prefix="/whatsapp/welcome", tags=["WhatsApp Welcome DM"])
 
+# Único evento que este webhook processa (comparado contra event.upper())
+_PARTICIPANT_EVENT = "GROUP_PARTICIPANTS_UPDATE"
+
+# Segredo para verificação HMAC dos webhooks (opcional). hashlib/hmac
+# despacham para o OpenSSL, que usa as instruções SHA da CPU quando
+# disponíveis — a verificação custa ~1µs por payload
+_WEBHOOK_SECRET = os.getenv("EVOLUTION_WEBHOOK_SECRET", "").encode()
+SIGNATURE_HEADER = "x-webhook-signature"
+
+
+def verify_webhook_signature(body: bytes, signature: str | None) -> bool:
+    """Valida a assinatura HMAC-SHA256 do corpo cru do webhook.
+
+    Sem EVOLUTION_WEBHOOK_SECRET configurado a verificação fica
+    desligada (compatível com instalações existentes).
+
+    Args:
+        body: Bytes crus do corpo da requisição
+        signature: Valor do header de assinatura (hex)
+
+    Returns:
+        True se a assinatura confere (ou se a verificação está off)
+    """
+    if not _WEBHOOK_SECRET:
+        return True
+    if not signature:
+        return False
+    expected = hmac.new(_WEBHOOK_SECRET, body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+# Deduplicação de replays: a Evolution pode reentregar o mesmo webhook
+# (retry/timeout), o que duplicaria DMs e escritas no KV. O hash do
+# data do payload fica num dict em memória com TTL; blake2b é mais
+# rápido que SHA-256 para inputs curtos e basta para dedup. Sem Redis
+# no deploy (processo único), o dict local cumpre o mesmo papel
+DEDUP_TTL_SECONDS = 600.0
+_DEDUP_MAX_ENTRIES = 4_096
+
+_dedup_seen: dict[str, float] = {}
+
+
+def _dedup_key(data: dict) -> str:
+    """Chave de idempotência do evento (hash do data canônico)."""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def _is_duplicate(key: str) -> bool:
+    """Registra a chave e diz se ela já foi vista dentro do TTL."""
+    now = time.monotonic()
+    expiry = _dedup_seen.get(key)
+    if expiry is not None and expiry > now:
+        return True
+    if len(_dedup_seen) >= _DEDUP_MAX_ENTRIES:
+        for stale in [k for k, exp in _dedup_seen.items() if exp <= now]:
+            del _dedup_seen[stale]
+    _dedup_seen[key] = now + DEDUP_TTL_SECONDS
+    return False
+
+
+# DMs do mesmo evento saem em paralelo (o tempo vira max(latência) em vez
+# da soma), com um teto de chamadas simultâneas à Evolution API
+MAX_CONCURRENT_DMS = 10
+_dm_semaphore = asyncio.Semaphore(MAX_CONCURRENT_DMS)
+
+# Fila de eventos de participantes: o webhook só enfileira e responde na
+# hora; um worker dedicado processa com retry. Mantém o event loop do
+# HTTP livre durante rajadas e dá nova chance a falhas transitórias
+JOIN_QUEUE_MAX = 1_000
+JOIN_MAX_RETRIES = 3
+JOIN_RETRY_BACKOFF_SECONDS = 2.0
+
+_join_queue: asyncio.Queue[dict] | None = None
+_join_worker: asyncio.Task | None = None
+
+
+async def _ensure_join_worker() -> asyncio.Queue[dict]:
+    """Garante fila + worker de joins ativos (lazy, no primeiro webhook)."""
+    global _join_queue, _join_worker
+    if _join_queue is None:
+        _join_queue = asyncio.Queue(maxsize=JOIN_QUEUE_MAX)
+    if _join_worker is None or _join_worker.done():
+        _join_worker = asyncio.create_task(_join_worker_loop())
+    return _join_queue
+
+
+async def _join_worker_loop() -> None:
+    """Consome a fila de joins, com retry exponencial por evento."""
+    user_manager = await get_user_manager()
+    evolution = get_evolution_client()
+    while True:
+        payload = await _join_queue.get()
+        for attempt in range(1, JOIN_MAX_RETRIES + 1):
+            try:
+                await process_group_join(payload, user_manager, evolution)
+                break
+            except Exception as e:
+                logger.error(
+                    "[WELCOME] Tentativa %s/%s falhou: %s",
+                    attempt,
+                    JOIN_MAX_RETRIES,
+                    e,
+                    exc_info=attempt == JOIN_MAX_RETRIES,
+                )
+                if attempt < JOIN_MAX_RETRIES:
+                    await asyncio.sleep(JOIN_RETRY_BACKOFF_SECONDS * attempt)
+        _join_queue.task_done()
+
+
+# Normalização de telefone em uma passada: remove +, -, espaços e o
+# sufixo @... (os .replace/.split encadeados alocavam uma string cada)
+_PHONE_CLEAN_RE = re.compile(r"[+\-\s]|@.*$")
+
+
+def normalize_phone(value: str) -> str:
+    """Extrai o número limpo de um telefone ou JID (número@s.whatsapp.net)."""
+    return _PHONE_CLEAN_RE.sub("", value)
+
+
+# Mensagem de despedida: todo o texto é estático (inclusive o link de
+# convite, lido do .env uma vez), então é montada uma única vez no
+# import em vez de uma f-string por participante que sai
+_INVITE_LINK = os.getenv(
+    "WHATSAPP_GROUP_INVITE_LINK", "https://chat.whatsapp.com/BKrn8SOMBYG8v9LWtFOTJk"
+)
+_GOODBYE_MESSAGE = (
+    "Oi! 👋\n\n"
+    "Vi que você saiu do grupo.\n\n"
+    "Sentiremos sua falta! 😢\n\n"
+    "Se quiser voltar a qualquer momento, é só clicar no link abaixo:\n"
+    f"👉 {_INVITE_LINK}\n\n"
+    "Estaremos te esperando! 🎮"
+)
+
+
 # Singleton do UserManager
 _user_manager: UserManagerKV | None = None
 
@@ -39,7 +190,7 @@ async def get_user_manager() -> UserManagerKV:
     """Obtém ou cria singleton do UserManager."""
     global _user_manager
     if _user_manager is None:
-        agentfs = await app_state.get_agentfs()
+        agentfs = await app_state.get_async_agentfs()
         _user_manager = UserManagerKV(agentfs)
         logger.info("UserManagerKV inicializado para Welcome DMs")
     return _user_manager
@@ -51,39 +202,47 @@ async def get_user_manager() -> UserManagerKV:
 
 
 @router.post("/webhook")
-async def welcome_webhook(
-    request: Request,
-    background_tasks: BackgroundTasks,
-) -> dict:
+async def welcome_webhook(request: Request) -> dict:
     """
     Webhook dedicado para eventos de entrada em grupos.
 
-    Recebe GROUP_PARTICIPANTS_UPDATE e processa DMs de boas-vindas.
+    Recebe GROUP_PARTICIPANTS_UPDATE e enfileira para o worker de joins.
     """
+    # Corpo cru lido uma vez: serve para a assinatura e para o decode
+    raw = await request.body()
+    if not verify_webhook_signature(raw, request.headers.get(SIGNATURE_HEADER)):
+        logger.warning("[WELCOME] Assinatura de webhook inválida")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
     try:
-        payload = await request.json()
+        # Decode direto dos bytes crus (orjson quando disponível)
+        payload = _loads(raw)
     except Exception as e:
-        logger.error(f"Erro ao parsear payload: {e}")
+        logger.error("Erro ao parsear payload: %s", e)
         return {"status": "error", "message": "Invalid JSON"}
 
     event = payload.get("event", "")
 
     # Só processa eventos de participantes
-    if event.upper() != "GROUP_PARTICIPANTS_UPDATE":
+    if event.upper() != _PARTICIPANT_EVENT:
         return {"status": "ignored", "event": event}
 
-    logger.info(f"[WELCOME] Evento recebido: {event}")
+    # Replays da Evolution (retry de entrega) não devem gerar DMs nem
+    # escritas duplicadas
+    if _is_duplicate(_dedup_key(payload.get("data", {}))):
+        logger.info("[WELCOME] Evento duplicado ignorado: %s", event)
+        return {"status": "duplicate", "event": event}
 
-    # Processar em background
-    user_manager = await get_user_manager()
-    evolution = get_evolution_client()
+    logger.info("[WELCOME] Evento recebido: %s", event)
 
-    background_tasks.add_task(
-        process_group_join,
-        payload=payload,
-        user_manager=user_manager,
-        evolution=evolution,
-    )
+    # Enfileirar e responder: o worker processa (com retry) fora do
+    # ciclo request/response
+    queue = await _ensure_join_worker()
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        logger.error("[WELCOME] Fila de joins cheia; evento descartado")
+        return {"status": "overloaded", "event": event}
 
     return {"status": "processing", "event": event}
 
@@ -101,68 +260,84 @@ async def process_group_join(
         user_manager: Gerenciador de usuários
         evolution: Cliente Evolution API
     """
-    try:
-        data = payload.get("data", {})
-        action = data.get("action", "").lower()
-
-        group_id = data.get("groupJid", "") or data.get("id", "")
-        participants = data.get("participants", [])
-        group_name = data.get("subject", "") or data.get("groupName", "")
-
-        if not group_id or not participants:
-            logger.warning("[WELCOME] Dados incompletos no payload")
-            return
-
-        # Verificar se welcome está ativo para este grupo
-        welcome_config = await user_manager.get_welcome_config(group_id)
-        if not welcome_config.enabled:
-            logger.info(f"[WELCOME] Welcome desabilitado para grupo {group_id}")
-            return
-
-        # Atualizar nome do grupo se disponível
-        if group_name and not welcome_config.group_name:
-            welcome_config.group_name = group_name
-            await user_manager.save_welcome_config(welcome_config)
-
-        # =====================================================
-        # ENTRADA no grupo (add/join/invite)
-        # =====================================================
-        if action in ["add", "join", "invite"]:
-            logger.info(
-                f"[WELCOME] {len(participants)} novos membros no grupo {group_name or group_id}"
-            )
-            for participant in participants:
-                await _send_welcome_dm(
+    data = payload.get("data", {})
+    action = data.get("action", "").lower()
+
+    group_id = data.get("groupJid", "") or data.get("id", "")
+    participants = data.get("participants", [])
+    group_name = data.get("subject", "") or data.get("groupName", "")
+
+    if not group_id or not participants:
+        logger.warning("[WELCOME] Dados incompletos no payload")
+        return
+
+    # Verificar se welcome está ativo para este grupo
+    welcome_config = await user_manager.get_welcome_config(group_id)
+    if not welcome_config.enabled:
+        logger.info("[WELCOME] Welcome desabilitado para grupo %s", group_id)
+        return
+
+    # Atualizar nome do grupo se disponível
+    if group_name and not welcome_config.group_name:
+        welcome_config.group_name = group_name
+        await user_manager.save_welcome_config(welcome_config)
+
+    # Fallback resolvido uma vez, fora dos fan-outs por participante
+    effective_group_name = group_name or welcome_config.group_name
+
+    # =====================================================
+    # ENTRADA no grupo (add/join/invite)
+    # =====================================================
+    if action in ["add", "join", "invite"]:
+        logger.info(
+            "[WELCOME] %s novos membros no grupo %s", len(participants), group_name or group_id
+        )
+        # Cada DM é independente: disparar todas e aguardar o conjunto
+        results = await asyncio.gather(
+            *(
+                _send_welcome_dm(
                     participant=participant,
                     group_id=group_id,
-                    group_name=group_name or welcome_config.group_name,
+                    group_name=effective_group_name,
                     user_manager=user_manager,
                     evolution=evolution,
                     config=welcome_config,
                 )
-
-        # =====================================================
-        # SAÍDA do grupo (remove/leave)
-        # =====================================================
-        elif action in ["remove", "leave"]:
-            logger.info(
-                f"[GOODBYE] {len(participants)} saíram do grupo {group_name or group_id}"
-            )
-            for participant in participants:
-                await _send_goodbye_dm(
+                for participant in participants
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error("[WELCOME] Erro em DM paralela: %s", result)
+
+    # =====================================================
+    # SAÍDA do grupo (remove/leave)
+    # =====================================================
+    elif action in ["remove", "leave"]:
+        logger.info(
+            "[GOODBYE] %s saíram do grupo %s", len(participants), group_name or group_id
+        )
+        results = await asyncio.gather(
+            *(
+                _send_goodbye_dm(
                     participant=participant,
                     group_id=group_id,
-                    group_name=group_name or welcome_config.group_name,
+                    group_name=effective_group_name,
                     user_manager=user_manager,
                     evolution=evolution,
                     config=welcome_config,
                 )
+                for participant in participants
+            ),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error("[GOODBYE] Erro em DM paralela: %s", result)
 
-        else:
-            logger.debug(f"[WELCOME] Ação ignorada: {action}")
-
-    except Exception as e:
-        logger.error(f"[WELCOME] Erro ao processar evento: {e}", exc_info=True)
+    else:
+        logger.debug("[WELCOME] Ação ignorada: %s", action)
 
 
 async def _send_welcome_dm(
@@ -194,28 +369,25 @@ async def _send_welcome_dm(
             user_name = participant.get("name", participant.get("pushName", ""))
 
             # Se temos phoneNumber, usar ele para extrair telefone
-            if phone_number:
-                phone_clean = phone_number.split("@")[0]
-            else:
-                phone_clean = user_id.split("@")[0]
+            phone_clean = normalize_phone(phone_number or user_id)
         else:
             user_id = str(participant)
-            phone_clean = user_id.split("@")[0]
+            phone_clean = normalize_phone(user_id)
             user_name = ""
 
         if not phone_clean:
-            logger.warning(f"[WELCOME] Não foi possível extrair telefone do participante")
+            logger.warning("[WELCOME] Não foi possível extrair telefone do participante")
             return
 
         # ID para armazenamento (usar phoneNumber se disponível)
         storage_id = f"{phone_clean}@s.whatsapp.net"
 
-        logger.info(f"[WELCOME] Processando participante: phone={phone_clean}, id={user_id}")
+        logger.info("[WELCOME] Processando participante: phone=%s, id=%s", phone_clean, user_id)
 
         # Verificar se já foi welcomed para este grupo
         should_send = await user_manager.should_send_welcome(storage_id, group_id)
         if not should_send:
-            logger.info(f"[WELCOME] Usuário {phone_clean} já foi welcomed para este grupo")
+            logger.info("[WELCOME] Usuário %s já foi welcomed para este grupo", phone_clean)
             return
 
         # Registrar usuário no grupo
@@ -236,24 +408,30 @@ async def _send_welcome_dm(
             phone=phone_clean,
         )
 
-        # Enviar DM usando o número de telefone real
-        logger.info(f"[WELCOME] Enviando DM para {phone_clean}")
-        success = await evolution.send_text(phone_clean, message)
+        # Enviar DM usando o número de telefone real (semáforo limita as
+        # chamadas simultâneas à Evolution; o delay acima roda em paralelo)
+        logger.info("[WELCOME] Enviando DM para %s", phone_clean)
+        async with _dm_semaphore:
+            success = await evolution.send_text(phone_clean, message)
 
         if success:
-            # Marcar como welcomed e salvar histórico
-            await user_manager.mark_user_welcomed(storage_id, group_id)
-            await user_manager.add_conversation_message(
-                user_id=storage_id,
-                role="assistant",
-                content=message,
+            # Marcar como welcomed e salvar histórico: escritas
+            # independentes no KV saem concorrentes (o perfil já
+            # carregado é compartilhado, sem re-busca)
+            await asyncio.gather(
+                user_manager.mark_user_welcomed(user, group_id),
+                user_manager.add_conversation_message(
+                    user,
+                    role="assistant",
+                    content=message,
+                ),
             )
-            logger.info(f"[WELCOME] DM enviada para {user.display_name} ({phone_clean})")
+            logger.info("[WELCOME] DM enviada para %s (%s)", user.display_name, phone_clean)
         else:
-            logger.error(f"[WELCOME] Falha ao enviar DM para {phone_clean}")
+            logger.error("[WELCOME] Falha ao enviar DM para %s", phone_clean)
 
     except Exception as e:
-        logger.error(f"[WELCOME] Erro ao enviar welcome DM: {e}", exc_info=True)
+        logger.error("[WELCOME] Erro ao enviar welcome DM: %s", e, exc_info=True)
 
 
 async def _send_goodbye_dm(
@@ -283,21 +461,18 @@ async def _send_goodbye_dm(
             user_id = participant.get("id", participant.get("jid", ""))
             user_name = participant.get("name", participant.get("pushName", ""))
 
-            if phone_number:
-                phone_clean = phone_number.split("@")[0]
-            else:
-                phone_clean = user_id.split("@")[0]
+            phone_clean = normalize_phone(phone_number or user_id)
         else:
             user_id = str(participant)
-            phone_clean = user_id.split("@")[0]
+            phone_clean = normalize_phone(user_id)
             user_name = ""
 
         if not phone_clean:
-            logger.warning(f"[GOODBYE] Não foi possível extrair telefone do participante")
+            logger.warning("[GOODBYE] Não foi possível extrair telefone do participante")
             return
 
         storage_id = f"{phone_clean}@s.whatsapp.net"
-        logger.info(f"[GOODBYE] Processando saída: phone={phone_clean}")
+        logger.info("[GOODBYE] Processando saída: phone=%s", phone_clean)
 
         # Buscar usuário (pode já existir no sistema)
         user = await user_manager.get_user(storage_id, user_name)
@@ -306,38 +481,27 @@ async def _send_goodbye_dm(
         if config.delay_seconds > 0:
             await asyncio.sleep(config.delay_seconds)
 
-        # Mensagem de despedida com link para voltar
         name = user.display_name or user_name or phone_clean
-
-        # Link do grupo Quiz - Ton (configurável via .env)
-        invite_link = os.getenv("WHATSAPP_GROUP_INVITE_LINK", "https://chat.whatsapp.com/BKrn8SOMBYG8v9LWtFOTJk")
-
-        goodbye_message = (
-            f"Oi! 👋\n\n"
-            f"Vi que você saiu do grupo.\n\n"
-            f"Sentiremos sua falta! 😢\n\n"
-            f"Se quiser voltar a qualquer momento, é só clicar no link abaixo:\n"
-            f"👉 {invite_link}\n\n"
-            f"Estaremos te esperando! 🎮"
-        )
+        goodbye_message = _GOODBYE_MESSAGE
 
         # Enviar DM
-        logger.info(f"[GOODBYE] Enviando DM para {phone_clean}")
-        success = await evolution.send_text(phone_clean, goodbye_message)
+        logger.info("[GOODBYE] Enviando DM para %s", phone_clean)
+        async with _dm_semaphore:
+            success = await evolution.send_text(phone_clean, goodbye_message)
 
         if success:
             # Salvar no histórico de conversa
             await user_manager.add_conversation_message(
-                user_id=storage_id,
+                user,
                 role="assistant",
                 content=goodbye_message,
             )
-            logger.info(f"[GOODBYE] DM de despedida enviada para {name} ({phone_clean})")
+            logger.info("[GOODBYE] DM de despedida enviada para %s (%s)", name, phone_clean)
         else:
-            logger.error(f"[GOODBYE] Falha ao enviar DM de despedida para {phone_clean}")
+            logger.error("[GOODBYE] Falha ao enviar DM de despedida para %s", phone_clean)
 
     except Exception as e:
-        logger.error(f"[GOODBYE] Erro ao enviar goodbye DM: {e}", exc_info=True)
+        logger.error("[GOODBYE] Erro ao enviar goodbye DM: %s", e, exc_info=True)
 
 
 # =============================================================================
@@ -353,21 +517,55 @@ class WelcomeConfigUpdate(BaseModel):
     ai_enabled: bool | None = None
 
 
-@router.get("/config/{group_id}")
+# Modelos de resposta: devolver o objeto de domínio com response_model
+# usa o serializador Rust do pydantic-core e pula o jsonable_encoder
+# (que percorria o dict campo a campo em Python)
+
+
+class WelcomeConfigResponse(BaseModel):
+    """Projeção pública da config de welcome."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    group_id: str
+    group_name: str
+    enabled: bool
+    welcome_message: str
+    delay_seconds: int
+    ai_enabled: bool
+
+
+class UserStatsResponse(BaseModel):
+    """Contadores agregados de usuários."""
+
+    total_users: int
+    welcomed_users: int
+    engaged_users: int
+    total_messages: int
+
+
+class UserProfileResponse(BaseModel):
+    """Projeção pública do perfil de usuário."""
+
+    user_id: str
+    display_name: str
+    phone_number: str
+    status: str
+    groups: list[str]
+    total_messages_sent: int
+    total_messages_received: int
+    first_seen: datetime | None
+    last_interaction: datetime | None
+    conversation_history: int
+
+
+@router.get("/config/{group_id}", response_model=WelcomeConfigResponse)
 async def get_welcome_config(
     group_id: str,
     user_manager: UserManagerKV = Depends(get_user_manager),
-) -> dict:
+) -> WelcomeConfig:
     """Retorna configuração de welcome para um grupo."""
-    config = await user_manager.get_welcome_config(group_id)
-    return {
-        "group_id": config.group_id,
-        "group_name": config.group_name,
-        "enabled": config.enabled,
-        "welcome_message": config.welcome_message,
-        "delay_seconds": config.delay_seconds,
-        "ai_enabled": config.ai_enabled,
-    }
+    return await user_manager.get_welcome_config(group_id)
 
 
 @router.post("/config/{group_id}")
@@ -416,7 +614,7 @@ async def toggle_welcome(
     }
 
 
-@router.get("/users")
+@router.get("/users", response_model=UserStatsResponse)
 async def list_all_users(
     user_manager: UserManagerKV = Depends(get_user_manager),
 ) -> dict:
@@ -431,42 +629,35 @@ async def list_group_users(
     user_manager: UserManagerKV = Depends(get_user_manager),
 ) -> dict:
     """Lista usuários de um grupo específico."""
-    users = await user_manager.get_users_in_group(group_id)
+    # Projeção direto do KV: evita hidratar perfis inteiros (com
+    # histórico de conversa) só para devolver cinco campos
+    users = await user_manager.list_group_user_summaries(group_id)
     return {
         "group_id": group_id,
         "total": len(users),
-        "users": [
-            {
-                "user_id": u.user_id,
-                "display_name": u.display_name,
-                "status": u.status.value,
-                "welcomed": u.was_welcomed_for_group(group_id),
-                "total_messages": u.total_messages_sent,
-            }
-            for u in users
-        ],
+        "users": users,
     }
 
 
-@router.get("/user/{user_id}")
+@router.get("/user/{user_id}", response_model=UserProfileResponse)
 async def get_user_profile(
     user_id: str,
     user_manager: UserManagerKV = Depends(get_user_manager),
-) -> dict:
+) -> UserProfileResponse:
     """Retorna perfil completo de um usuário."""
     user = await user_manager.get_user(user_id)
-    return {
-        "user_id": user.user_id,
-        "display_name": user.display_name,
-        "phone_number": user.phone_clean,
-        "status": user.status.value,
-        "groups": list(user.groups.keys()),
-        "total_messages_sent": user.total_messages_sent,
-        "total_messages_received": user.total_messages_received,
-        "first_seen": user.first_seen_at.isoformat() if user.first_seen_at else None,
-        "last_interaction": user.last_interaction_at.isoformat() if user.last_interaction_at else None,
-        "conversation_history": len(user.conversation_history),
-    }
+    return UserProfileResponse(
+        user_id=user.user_id,
+        display_name=user.display_name,
+        phone_number=user.phone_clean,
+        status=user.status.value,
+        groups=sorted(user.group_ids),
+        total_messages_sent=user.total_messages_sent,
+        total_messages_received=user.total_messages_received,
+        first_seen=user.first_seen_at,
+        last_interaction=user.last_interaction_at,
+        conversation_history=len(user.conversation_history),
+    )
 
 
 class ManualDMRequest(BaseModel):
@@ -484,7 +675,7 @@ async def send_manual_dm(
     evolution = get_evolution_client()
 
     # Normalizar telefone
-    phone = request.phone.replace("+", "").replace("-", "").replace(" ", "")
+    phone = normalize_phone(request.phone)
 
     success = await evolution.send_text(phone, request.message)
 
@@ -493,7 +684,7 @@ async def send_manual_dm(
         user_id = f"{phone}@s.whatsapp.net"
         try:
             await user_manager.add_conversation_message(
-                user_id=user_id,
+                user_id,
                 role="assistant",
                 content=request.message,
             )
@@ -515,7 +706,7 @@ async def send_manual_welcome(
     evolution = get_evolution_client()
 
     # Normalizar telefone
-    phone = phone.replace("+", "").replace("-", "").replace(" ", "")
+    phone = normalize_phone(phone)
     user_id = f"{phone}@s.whatsapp.net"
 
     # Carregar ou criar usuário
@@ -533,11 +724,13 @@ async def send_manual_welcome(
     success = await evolution.send_text(phone, message)
 
     if success:
-        await user_manager.mark_user_welcomed(user_id, group_id)
-        await user_manager.add_conversation_message(
-            user_id=user_id,
-            role="assistant",
-            content=message,
+        await asyncio.gather(
+            user_manager.mark_user_welcomed(user, group_id),
+            user_manager.add_conversation_message(
+                user,
+                role="assistant",
+                content=message,
+            ),
         )
         return {
             "status": "sent",